@@ -8,6 +8,8 @@ client = AsyncAzureOpenAI(
     api_key=os.getenv("AZURE_OPENAI_API_KEY"),
     api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
     azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+    # Retries are handled by the LLM gateway (app/agent/gateway.py)
+    max_retries=0,
 )
 
 # The model deployment name (not model name like gpt-4), as created in Azure portal
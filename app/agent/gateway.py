@@ -0,0 +1,281 @@
+import asyncio
+import json
+import random
+import time
+import openai
+from openai import AsyncAzureOpenAI
+from app.agent.client import client, MODEL_NAME
+from app.config import settings
+from app.agent.tokens import estimate_tokens
+
+# Errors worth another attempt, as long as nothing has been streamed yet
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class TokenBucket:
+    """Refills at `per_minute / 60` per second and holds at most `burst_seconds` worth."""
+
+    def __init__(self, per_minute: float, burst_seconds: float = 10):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until `amount` could be taken (0 when it can be taken now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def take(self, amount: float):
+        self._refill()
+        # May go negative; later callers then wait for the debt to refill
+        self.tokens -= min(amount, self.capacity)
+
+
+class Deployment:
+    """One Azure OpenAI deployment with its own rate limits and load balancing weight."""
+
+    def __init__(self, name, client, model, weight=1.0, tokens_per_minute=0, requests_per_minute=0):
+        self.name = name
+        self.client = client
+        self.model = model
+        self.weight = weight
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.cooldown_until = 0.0
+        self.stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+    def delay(self, tokens: int) -> float:
+        waits = [max(0.0, self.cooldown_until - time.monotonic())]
+        if self.tokens:
+            waits.append(self.tokens.delay(tokens))
+        if self.requests:
+            waits.append(self.requests.delay(1))
+        return max(waits)
+
+    def take(self, tokens: int):
+        if self.tokens:
+            self.tokens.take(tokens)
+        if self.requests:
+            self.requests.take(1)
+        self.stats["requests"] += 1
+
+
+def load_deployments() -> list[Deployment]:
+    """
+    Deployments from LLM_DEPLOYMENTS, a JSON list of objects with endpoint,
+    api_key, api_version, model and optional name, weight, tokens_per_minute and
+    requests_per_minute. Without it, the single client from app.agent.client is used.
+    """
+    if not settings.LLM_DEPLOYMENTS:
+        return [Deployment(
+            "default", client, MODEL_NAME,
+            tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+            requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+        )]
+
+    deployments = []
+    for i, config in enumerate(json.loads(settings.LLM_DEPLOYMENTS)):
+        deployment_client = AsyncAzureOpenAI(
+            api_key=config["api_key"],
+            api_version=config["api_version"],
+            azure_endpoint=config["endpoint"],
+            max_retries=0,
+        )
+        deployments.append(Deployment(
+            config.get("name", f"deployment-{i}"),
+            deployment_client,
+            config["model"],
+            weight=float(config.get("weight", 1)),
+            tokens_per_minute=config.get("tokens_per_minute", settings.LLM_TOKENS_PER_MINUTE),
+            requests_per_minute=config.get("requests_per_minute", settings.LLM_REQUESTS_PER_MINUTE),
+        ))
+    return deployments
+
+
+class LLMGateway:
+    """
+    Single way out to the chat completion deployments.
+
+    Every call waits for a slot under a global concurrency cap, then for a
+    deployment whose token and request buckets can take it. Deployments are
+    picked at random by weight among those ready now. Rate limits, timeouts and
+    5xx answers are retried with jittered exponential backoff, but only until
+    the first token has been streamed; after that an error reaches the caller.
+    """
+
+    def __init__(self, deployments: list[Deployment], max_concurrency: int, max_retries: int,
+                 retry_base_seconds: float, retry_max_seconds: float, hedge_delay_ms: float):
+        self.deployments = deployments
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_base = retry_base_seconds
+        self.retry_max = retry_max_seconds
+        self.hedge_delay = hedge_delay_ms / 1000
+        self._semaphore = None
+        self._loop = None
+        self.counters = {"calls": 0, "retries": 0, "failures": 0, "hedged": 0, "hedge_wins": 0}
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    def _pick(self, tokens: int, avoid=None) -> tuple[Deployment, float]:
+        candidates = [d for d in self.deployments if d.name != avoid] or self.deployments
+        delays = {d.name: d.delay(tokens) for d in candidates}
+        ready = [d for d in candidates if delays[d.name] == 0]
+        if ready:
+            return random.choices(ready, weights=[d.weight for d in ready])[0], 0.0
+        deployment = min(candidates, key=lambda d: delays[d.name])
+        return deployment, delays[deployment.name]
+
+    async def _acquire(self, tokens: int, avoid=None) -> Deployment:
+        while True:
+            deployment, wait = self._pick(tokens, avoid)
+            if wait == 0:
+                deployment.take(tokens)
+                return deployment
+            await asyncio.sleep(wait)
+
+    def _backoff(self, attempt: int, error: Exception, deployment: Deployment) -> float:
+        delay = random.uniform(0, min(self.retry_max, self.retry_base * 2 ** attempt))
+        if isinstance(error, openai.RateLimitError):
+            deployment.stats["rate_limited"] += 1
+            retry_after = error.response.headers.get("retry-after") if error.response is not None else None
+            try:
+                cooldown = float(retry_after)
+            except (TypeError, ValueError):
+                cooldown = delay
+            deployment.cooldown_until = time.monotonic() + cooldown
+            # Another deployment may be free right away
+            if len(self.deployments) > 1:
+                return 0.0
+            return max(delay, cooldown)
+        return delay
+
+    async def _retrying(self, messages, call, avoid=None, picked=None):
+        """Run `call(deployment)` with retries; it must raise before producing any output."""
+        tokens = sum(estimate_tokens(str(m.get("content", ""))) for m in messages) + settings.LLM_EXPECTED_OUTPUT_TOKENS
+        self.counters["calls"] += 1
+        attempt = 0
+        while True:
+            deployment = await self._acquire(tokens, avoid)
+            if picked is not None:
+                picked.append(deployment.name)
+            try:
+                return await call(deployment)
+            except RETRYABLE_ERRORS as e:
+                deployment.stats["errors"] += 1
+                if attempt >= self.max_retries:
+                    self.counters["failures"] += 1
+                    raise
+                attempt += 1
+                self.counters["retries"] += 1
+                delay = self._backoff(attempt, e, deployment)
+                print(f"⚠️ LLM call on {deployment.name} failed ({type(e).__name__}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def stream_chat(self, messages: list[dict], **params):
+        """Async generator of content deltas from a streamed chat completion."""
+        async def open_stream(deployment):
+            response = await deployment.client.chat.completions.create(
+                model=deployment.model, messages=messages, stream=True, **params
+            )
+            iterator = response.__aiter__()
+            try:
+                # Wait for the first token inside the retry loop
+                async for chunk in iterator:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        return response, iterator, chunk.choices[0].delta.content
+            except BaseException:
+                # Release the connection before the retry opens another one
+                await response.close()
+                raise
+            return response, iterator, None
+
+        async with self.semaphore:
+            response, iterator, first = await self._retrying(messages, open_stream)
+            try:
+                if first is None:
+                    return
+                yield first
+                async for chunk in iterator:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                await response.close()
+
+    async def _complete_once(self, messages, params, avoid=None, picked=None) -> str:
+        async def create(deployment):
+            response = await deployment.client.chat.completions.create(
+                model=deployment.model, messages=messages, **params
+            )
+            return response.choices[0].message.content
+
+        async with self.semaphore:
+            return await self._retrying(messages, create, avoid, picked)
+
+    async def complete(self, messages: list[dict], hedge: bool = False, **params) -> str:
+        """
+        Non-streamed chat completion. With `hedge`, a second request goes to
+        another deployment when the first has not answered after the hedge
+        delay; whichever succeeds first wins and the other is cancelled.
+        """
+        if not hedge:
+            return await self._complete_once(messages, params)
+
+        picked = []
+        primary = asyncio.ensure_future(self._complete_once(messages, params, picked=picked))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay)
+        if done:
+            return primary.result()
+
+        self.counters["hedged"] += 1
+        backup = asyncio.ensure_future(
+            self._complete_once(messages, params, avoid=picked[-1] if picked else None)
+        )
+        pending = {primary, backup}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.counters["hedge_wins"] += 1
+                        return task.result()
+            # Both failed
+            return primary.result()
+        finally:
+            for task in (primary, backup):
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "deployments": {d.name: d.stats for d in self.deployments},
+        }
+
+
+llm_gateway = LLMGateway(
+    load_deployments(),
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    max_retries=settings.LLM_MAX_RETRIES,
+    retry_base_seconds=settings.LLM_RETRY_BASE_SECONDS,
+    retry_max_seconds=settings.LLM_RETRY_MAX_SECONDS,
+    hedge_delay_ms=settings.LLM_HEDGE_DELAY_MS,
+)
@@ -0,0 +1,7 @@
+import math
+from app.config import settings
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count from the text length (CONTEXT_CHARS_PER_TOKEN characters per token)."""
+    return math.ceil(len(text) / settings.CONTEXT_CHARS_PER_TOKEN)
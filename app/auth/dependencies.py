@@ -1,15 +1,18 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError
+from jwt import PyJWTError
 
-from app.database.dependencies import get_db
+from app.database.dependencies import get_async_db
 from app.models.user import User
 from app.auth.auth import decode_access_token
+from app.auth.principal_cache import principal_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid authentication credentials",
@@ -17,13 +20,19 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     )
     try:
         payload = decode_access_token(token)
-        user_id: int = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
+        user_id = int(payload.get("sub"))
+    # decode_access_token uses PyJWT; expired or malformed tokens raise PyJWTError
+    except (JWTError, PyJWTError, TypeError, ValueError):
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == user_id).first()
+    user = principal_cache.get(user_id)
+    if user is not None:
+        return user
+
+    # The session only takes a pooled connection here, on a cache miss
+    user = await db.scalar(select(User).where(User.id == user_id))
     if not user:
         raise credentials_exception
+    db.expunge(user)
+    principal_cache.put(user)
     return user
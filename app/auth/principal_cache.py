@@ -0,0 +1,70 @@
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+from app.config import settings
+from app.models.user import User
+
+
+class PrincipalCache:
+    """
+    Users resolved from token subjects, so authenticated requests skip the
+    `users` lookup.
+
+    Entries are detached `User` rows that expire after `ttl_seconds`; at most
+    `max_entries` are kept (least recently used dropped first). Updates and
+    deletes of a user through the ORM in this process invalidate it right
+    away; changes made elsewhere are picked up once the entry expires.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        user, cached_at = entry
+        if time.monotonic() - cached_at > self.ttl_seconds:
+            del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return user
+
+    def put(self, user: User):
+        if self.ttl_seconds <= 0:
+            return
+        self._entries[user.id] = (user, time.monotonic())
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    principal_cache.invalidate(target.id)
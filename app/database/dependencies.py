@@ -1,9 +1,16 @@
-from app.database.session import SessionLocal
+from app.database.session import SessionLocal, AsyncSessionLocal
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy.orm import Session as DBSession
 from app.models.log import UserSession, QueryLog
+from app.utils.active_sessions import active_sessions
+from app.config import settings
 
-from typing import Generator
+from datetime import datetime, timedelta
+from typing import AsyncGenerator, Generator
+
+SESSION_TIMEOUT_MINUTES = settings.SESSION_TIMEOUT_MINUTES  # Define session lifetime
 
 def get_db() -> Generator[DBSession, None, None]:
     db = SessionLocal()
@@ -12,6 +19,10 @@ def get_db() -> Generator[DBSession, None, None]:
     finally:
         db.close()
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def start_new_session(db: DBSession, user_id: int) -> int:
     session = UserSession(user_id=user_id)
     db.add(session)
@@ -19,6 +30,39 @@ def start_new_session(db: DBSession, user_id: int) -> int:
     db.refresh(session)
     return session.id
 
+async def get_or_create_active_session(db: AsyncSession, user_id: int) -> int:
+    """
+    Id of the user's session with activity within the timeout window, or of a new one.
+
+    The in-process cache answers the common case; otherwise the user's latest
+    session is checked against its last logged query (both lookups are
+    served by the composite indexes on sessions and query_logs).
+    """
+    session_id = active_sessions.get(user_id)
+    if session_id is not None:
+        return session_id
+
+    timeout_threshold = datetime.utcnow() - timedelta(minutes=SESSION_TIMEOUT_MINUTES)
+    latest = (await db.execute(
+        select(UserSession.id, UserSession.started_at)
+        .where(UserSession.user_id == user_id)
+        .order_by(UserSession.started_at.desc())
+        .limit(1)
+    )).first()
+    if latest is not None:
+        last_query = await db.scalar(select(func.max(QueryLog.timestamp)).where(QueryLog.session_id == latest.id))
+        if max(latest.started_at, last_query or latest.started_at) >= timeout_threshold:
+            session_id = latest.id
+
+    if session_id is None:
+        session = UserSession(user_id=user_id, started_at=datetime.utcnow())
+        db.add(session)
+        await db.commit()  # Commit the session immediately
+        session_id = session.id  # Loaded on flush; expire_on_commit is off
+
+    active_sessions.put(user_id, session_id)
+    return session_id
+
 def log_query(
     db: DBSession,
     user_id: int,
@@ -0,0 +1,63 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+from app.database.base import Base
+
+# Applied migration ids, kept outside the models' metadata
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _metadata,
+    Column("version", String(64), primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _create_model_index(connection: Connection, table_name: str, index_name: str):
+    """Create an index declared in a model's __table_args__ on a table that predates it."""
+    existing = {index["name"] for index in inspect(connection).get_indexes(table_name)}
+    if index_name in existing:
+        return
+    index = next(i for i in Base.metadata.tables[table_name].indexes if i.name == index_name)
+    index.create(connection)
+
+
+def _session_and_query_log_indexes(connection: Connection):
+    # Active-session lookup and /sessions listings: WHERE user_id ORDER BY started_at
+    _create_model_index(connection, "sessions", "ix_sessions_user_id_started_at")
+    # Session review: a session's queries in (timestamp, id) order
+    _create_model_index(connection, "query_logs", "ix_query_logs_session_id_timestamp")
+
+
+# Ordered; append new steps, never edit or reorder applied ones
+MIGRATIONS = [
+    ("0001_session_and_query_log_indexes", _session_and_query_log_indexes),
+]
+
+
+def run_migrations(engine: Engine) -> list[str]:
+    """
+    Apply the migrations not yet recorded in schema_migrations; returns their ids.
+
+    Run after `Base.metadata.create_all`, which creates missing tables (with
+    their declared indexes) but never alters existing ones. Each step is
+    idempotent, so a fresh database just records it.
+    """
+    _metadata.create_all(bind=engine)
+    with engine.connect() as connection:
+        applied = set(connection.scalars(select(schema_migrations.c.version)))
+
+    ran = []
+    for version, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        try:
+            with engine.begin() as connection:
+                migrate(connection)
+                connection.execute(schema_migrations.insert().values(version=version, applied_at=datetime.utcnow()))
+        except IntegrityError:
+            # Another process recorded it first
+            continue
+        print(f"🗄️ Applied migration {version}")
+        ran.append(version)
+    return ran
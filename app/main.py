@@ -1,21 +1,31 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 
 from app.routes.routes_auth import router as auth_router
 from app.routes.routes_ask import router as ask_router
-from app.routes.routes_upload import router as upload_router
+from app.routes.routes_upload import router as upload_router, MULTIPART_OVERHEAD_BYTES
 from app.routes.sessions import router as sessions_router
+from app.routes.routes_stats import router as stats_router
 
-from app.database.session import engine
+from app.database.session import engine, async_engine
 from app.database.base import Base
+from app.database.migrations import run_migrations
+from app.vectore_store.embedder import embedding_service
+from app.utils.executors import ExecutorSaturated, shutdown_executors
+from app.utils.ingestion import ingestion_worker
+from app.utils.log_writer import query_log_writer
+from app.utils.request_limits import BodySizeLimitMiddleware
+from app.config import settings
+from fastapi.concurrency import run_in_threadpool
 import uvicorn
 
 
 # Optional for development
 def init_db():
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
 
 app = FastAPI()
 
@@ -26,14 +36,49 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Keyset pagination of /sessions
+)
+# Refuse oversized uploads before Starlette spools the multipart body to disk
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_bytes=settings.UPLOAD_MAX_TOTAL_BYTES + MULTIPART_OVERHEAD_BYTES,
+    paths=("/upload_files",),
 )
 
 init_db()
 
+@app.on_event("startup")
+async def load_embedding_model():
+    # Load the embedding model once so /ask never pays the model load
+    await run_in_threadpool(embedding_service.load)
+
+@app.on_event("startup")
+async def start_ingestion_worker():
+    # Picks up jobs left queued or running by a previous process
+    await ingestion_worker.start()
+
+@app.on_event("startup")
+async def start_log_writer():
+    await query_log_writer.start()
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    await ingestion_worker.stop()
+    # Drains the queued query logs before the process exits
+    await query_log_writer.stop()
+    await embedding_service.close()
+    await async_engine.dispose()
+    shutdown_executors()
+
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request, exc: ExecutorSaturated):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
 app.include_router(auth_router)
 app.include_router(ask_router)
 app.include_router(upload_router)
 app.include_router(sessions_router)
+app.include_router(stats_router)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 @app.get("/signup")
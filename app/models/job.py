@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, TEXT, Boolean
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.database.base import Base
+
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+
+    # queued -> running -> completed | failed | cancelled
+    status = Column(String(20), nullable=False, default="queued")
+    progress = Column(Integer, nullable=False, default=0)
+    message = Column(String(1000), nullable=True)
+    # JSON list of {"filename", "status"}; a file's status is queued/done/skipped/failed
+    files = Column(TEXT, nullable=False)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    user = relationship("User", backref="ingestion_jobs")
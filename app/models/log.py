@@ -1,10 +1,12 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey,TEXT
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Index, TEXT
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database.base import Base
 
 class UserSession(Base):
     __tablename__ = "sessions"
+    # Existing databases get new indexes through app/database/migrations.py
+    __table_args__ = (Index("ix_sessions_user_id_started_at", "user_id", "started_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -16,6 +18,7 @@ class UserSession(Base):
 
 class QueryLog(Base):
     __tablename__ = "query_logs"
+    __table_args__ = (Index("ix_query_logs_session_id_timestamp", "session_id", "timestamp"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -28,3 +31,16 @@ class QueryLog(Base):
 
     user = relationship("User", backref="query_logs")
     session = relationship("UserSession", back_populates="query_logs")
+    stage_timings = relationship("QueryStageTiming", back_populates="query_log", cascade="all, delete-orphan")
+
+
+class QueryStageTiming(Base):
+    """Seconds spent in one /ask stage (rewrite, session_lookup, retrieval, embedding, search, llm, ttft, total, ...) of a logged query."""
+    __tablename__ = "query_stage_timings"
+
+    id = Column(Integer, primary_key=True, index=True)
+    query_log_id = Column(Integer, ForeignKey("query_logs.id"), nullable=False, index=True)
+    stage = Column(String(32), nullable=False)
+    seconds = Column(Float, nullable=False)
+
+    query_log = relationship("QueryLog", back_populates="stage_timings")
@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, Date, DateTime, Float, ForeignKey, TEXT
+from datetime import datetime
+from app.database.base import Base
+
+
+class SessionRollup(Base):
+    """Running response-time statistics of one session, updated as its queries are logged."""
+    __tablename__ = "session_rollups"
+
+    session_id = Column(Integer, ForeignKey("sessions.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    # Day the session started, which is what the date filters of /sessions apply to
+    day = Column(Date, nullable=False)
+
+    query_count = Column(Integer, nullable=False, default=0)
+    total_response_time = Column(Float, nullable=False, default=0.0)
+    min_response_time = Column(Float, nullable=True)
+    max_response_time = Column(Float, nullable=True)
+    # Serialized QuantileSketch of the response times
+    sketch = Column(TEXT, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class UserDailyRollup(Base):
+    """Response-time statistics of a user's sessions that started on one day."""
+    __tablename__ = "user_daily_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+
+    query_count = Column(Integer, nullable=False, default=0)
+    total_response_time = Column(Float, nullable=False, default=0.0)
+    min_response_time = Column(Float, nullable=True)
+    max_response_time = Column(Float, nullable=True)
+    sketch = Column(TEXT, nullable=False)
+    # JSON {stage: serialized QuantileSketch} of the /ask stage timings
+    stage_sketches = Column(TEXT, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
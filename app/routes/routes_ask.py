@@ -1,89 +1,146 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session as DBSession
-from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+import json
 import time
 
-from app.schemas.query import AskRequest, AskResponse
-from app.database.dependencies import get_db
+from app.schemas.query import AskRequest, AskResponse, BatchAskRequest
+from app.database.dependencies import get_async_db, get_or_create_active_session
 from app.auth.dependencies import get_current_user
 from app.models.user import User
-from app.models.log import QueryLog, UserSession
-from app.vectore_store.retriever import get_relevant_chunks
+from app.models.log import QueryLog, QueryStageTiming
+from app.utils.answer_cache import answer_cache, replay_chunks
+from app.utils.batch_qa import answer_batch, prepare_batch
+from app.utils.context_packer import pack_context
+from app.utils.pipeline import StageTimer, prepare_ask, record_stages
+from app.utils.log_writer import query_log_writer
+from app.config import settings
 from fastapi.responses import StreamingResponse
 from app.utils.agent_responder import stream_llm_response
-from app.utils.orchestrator import chat_history_analyzer
 
 router = APIRouter()
 
 
-SESSION_TIMEOUT_MINUTES = 5  # Define session lifetime
-
 @router.post("/ask")
 async def ask_question(
     request: AskRequest,
-    db: DBSession = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     if not request.question.strip():
         raise HTTPException(status_code=400, detail="Question cannot be empty.")
 
     start_time = time.time()
+    timer = StageTimer()
 
     original_user_input=request.question
+    user_id = current_user.id
 
-    updated_user_input = await chat_history_analyzer(original_user_input, request.chat_history)
-    print(updated_user_input)
-
-    relevant_chunks = await get_relevant_chunks(current_user.id, updated_user_input)
-    
-    # Step 1: Find or create session
-    timeout_threshold = datetime.utcnow() - timedelta(minutes=SESSION_TIMEOUT_MINUTES)
-    session = (
-        db.query(UserSession)
-        .filter(
-            UserSession.user_id == current_user.id,
-            UserSession.started_at >= timeout_threshold
-        )
-        .order_by(UserSession.started_at.desc())
-        .first()
+    # Step 1: Rewrite, session lookup and retrieval, overlapped
+    prepared = await prepare_ask(
+        user_id,
+        original_user_input,
+        request.chat_history,
+        lambda: get_or_create_active_session(db, user_id),
+        timer,
     )
+    updated_user_input = prepared.question
+    retrieval = prepared.retrieval
+    session_id = prepared.session_id
+    print(updated_user_input)
+    # Give the connection back to the pool; the stream and the log write don't need it
+    await db.close()
 
-    if not session:
-        session = UserSession(user_id=current_user.id, started_at=datetime.utcnow())
-        db.add(session)
-        db.commit()  # Commit the session immediately
-        db.refresh(session)  # Refresh to get the generated ID
+    cached_answer = None
+    if settings.ANSWER_CACHE_ENABLED and retrieval and retrieval.ids:
+        with timer.stage("answer_cache"):
+            cached_answer = answer_cache.lookup(
+                user_id, retrieval.ids, retrieval.query_vector, retrieval.index_version
+            )
 
-    # Store session_id to avoid detached instance issues
-    session_id = session.id
-    user_id = session.user_id
+    relevant_chunks = []
+    if cached_answer is None:
+        with timer.stage("context"):
+            relevant_chunks = pack_context(retrieval)
 
     # Step 2: Define generator to stream response and log at the same time
     async def stream_and_log():
         full_response = ""
-        try:
-            async for chunk in stream_llm_response(
-                context_str=relevant_chunks,
-                question=updated_user_input
-            ):
+        first_token = True
+        if cached_answer is not None:
+            # Same chunks, near-identical question: replay the earlier answer
+            for chunk in replay_chunks(cached_answer):
+                if first_token:
+                    timer.mark("ttft")
+                    first_token = False
                 full_response += chunk
                 yield chunk
-        except Exception as e:
-            yield f"\n[Error generating answer: {str(e)}]"
-            return
+        else:
+            try:
+                with timer.stage("llm"):
+                    async for chunk in stream_llm_response(
+                        context_str=relevant_chunks,
+                        question=updated_user_input
+                    ):
+                        if first_token:
+                            timer.mark("ttft")
+                            first_token = False
+                        full_response += chunk
+                        yield chunk
+            except Exception as e:
+                yield f"\n[Error generating answer: {str(e)}]"
+                return
+
+            if settings.ANSWER_CACHE_ENABLED and retrieval and retrieval.ids:
+                answer_cache.store(
+                    user_id, retrieval.ids, retrieval.query_vector, retrieval.index_version, full_response
+                )
 
         print(full_response)
         # After full stream, log to database
         response_time = round(time.time() - start_time, 3)
+        timer.mark("total")
+        print(f"⏱️ /ask stages: {timer.as_dict()} (speculative retrieval {'kept' if prepared.speculative_hit else 'discarded'})")
+        # The stage rows are built before log_enqueue runs, so that stage is only
+        # reported to /stats and /metrics, never persisted or rolled up
         log = QueryLog(
             user_id=user_id,
             question=original_user_input,
             response=full_response,
             response_time=response_time,
             timestamp=datetime.utcnow(),
-            session_id=session_id  # Use the stored session_id
+            session_id=session_id,  # Use the stored session_id
+            stage_timings=[
+                QueryStageTiming(stage=stage, seconds=seconds) for stage, seconds in timer.durations.items()
+            ],
         )
-        db.add(log)
-        db.commit()
+        with timer.stage("log_enqueue"):
+            await query_log_writer.submit(log)
+        record_stages(timer.durations)
 
     return StreamingResponse(stream_and_log(), media_type="text/plain")
+
+
+@router.post("/ask/batch")
+async def ask_batch(
+    request: BatchAskRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Answer many standalone questions; results stream back as NDJSON in completion order."""
+    questions = [question.strip() for question in request.questions]
+    if not questions or not all(questions):
+        raise HTTPException(status_code=400, detail="Questions cannot be empty.")
+    if len(questions) > settings.BATCH_ASK_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.BATCH_ASK_MAX_QUESTIONS} questions per batch."
+        )
+
+    retrievals, session_id = await prepare_batch(db, current_user.id, questions)
+
+    async def stream_results():
+        async for result in answer_batch(current_user.id, questions, retrievals, session_id, request.concurrency):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
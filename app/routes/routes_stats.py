@@ -0,0 +1,84 @@
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from app.agent.gateway import llm_gateway
+from app.config import settings
+from app.auth.principal_cache import principal_cache
+from app.utils.active_sessions import active_sessions
+from app.utils.answer_cache import answer_cache
+from app.utils.document_parser import parse_stats
+from app.utils.executors import executors
+from app.utils.log_writer import query_log_writer
+from app.utils.metrics import Gauge, registry
+from app.utils.orchestrator import get_rewrite_stats
+from app.utils.pipeline import stage_stats
+from app.vectore_store.index_cache import index_cache
+
+
+
+def require_metrics_access(authorization: Optional[str] = Header(None)):
+    """
+    /stats and /metrics expose per-process internals: they are off unless
+    METRICS_ENABLED, and need `Authorization: Bearer <METRICS_TOKEN>` when a token is set.
+    """
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    expected = f"Bearer {settings.METRICS_TOKEN}"
+    if settings.METRICS_TOKEN and not secrets.compare_digest(authorization or "", expected):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+router = APIRouter(dependencies=[Depends(require_metrics_access)])
+
+registry.register(Gauge(
+    "qa_rag_executor_pending", "Tasks queued or running per worker pool.",
+    lambda: {executor.name: executor.stats()["pending"] for executor in executors}, "pool",
+))
+registry.register(Gauge(
+    "qa_rag_index_cache_bytes", "Bytes held by the in-memory index cache.",
+    lambda: index_cache.stats()["bytes"],
+))
+registry.register(Gauge(
+    "qa_rag_answer_cache_hit_rate", "Share of answer cache lookups that were hits.",
+    lambda: answer_cache.stats()["hit_rate"],
+))
+registry.register(Gauge(
+    "qa_rag_log_queue_depth", "Query logs waiting for the background writer.",
+    lambda: query_log_writer.depth,
+))
+registry.register(Gauge(
+    "qa_rag_log_rows_written", "Query logs inserted by the background writer since start.",
+    lambda: query_log_writer.counters["written"],
+))
+registry.register(Gauge(
+    "qa_rag_llm_retries", "LLM calls retried by the gateway since start.",
+    lambda: llm_gateway.stats()["retries"],
+))
+
+
+@router.get("/stats")
+async def get_stats():
+    """In-process cache, rewrite, worker pool, LLM gateway, log writer and /ask stage counters."""
+    return {
+        "rewrite": get_rewrite_stats(),
+        "answer_cache": answer_cache.stats(),
+        "principal_cache": principal_cache.stats(),
+        "active_sessions": active_sessions.stats(),
+        "index_cache": index_cache.stats(),
+        "executors": {executor.name: executor.stats() for executor in executors},
+        "parsing": parse_stats.stats(),
+        "ask_stages": stage_stats.stats(),
+        "llm": llm_gateway.stats(),
+        "log_writer": query_log_writer.stats(),
+    }
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text exposition: /ask stage histograms and pool/cache gauges."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,104 +1,175 @@
+import asyncio
+import json
+import os
+import shutil
+import uuid
 from fastapi import APIRouter, UploadFile, File,Depends
 from fastapi.responses import StreamingResponse
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from typing import List
 from pathlib import Path
-import time
-import numpy as np
-import faiss
-import pickle
-from langchain_community.document_loaders import TextLoader, PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.embeddings import HuggingFaceEmbeddings
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database.dependencies import get_db
+from app.models.job import IngestionJob
+from app.schemas.job import IngestionJobOut
+from app.utils.answer_cache import answer_cache
+from app.utils.executors import search_executor
+from app.utils.ingestion import (
+    UPLOAD_DIR, TERMINAL_STATUSES, create_job, get_job, ingestion_worker, job_dir, job_to_dict,
+)
+from app.vectore_store.index_cache import index_cache
+from app.vectore_store.user_index import UserIndex, user_lock
 from fastapi import HTTPException
 from app.auth.dependencies import get_current_user
 from app.models.user import User
-from app.database.dependencies import get_db
-from sqlalchemy.orm import Session
 
 router = APIRouter()
 
-UPLOAD_DIR = Path("docs")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
-# Store text mapping to vector IDs (so you can later retrieve documents)
-id_to_text = {}
 
-@router.post("/upload_files")
-async def upload(files: List[UploadFile] = File(...),
-                current_user: User = Depends(get_current_user)):
+# Uploads are copied to disk in pieces of this size, never held in memory whole
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# Allowance for multipart boundaries and part headers on top of the file bytes
+MULTIPART_OVERHEAD_BYTES = 1024 * 1024
+
+
+async def save_upload(file: UploadFile, file_path: Path, budget: int) -> int:
+    """Stream an upload to disk, enforcing the per-file and remaining total size limits."""
+    limit = min(settings.UPLOAD_MAX_FILE_BYTES, budget)
+    written = 0
+    with open(file_path, "wb") as f:
+        while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+            written += len(chunk)
+            if written > limit:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"{file_path.name} exceeds the upload size limit of {limit // (1024 * 1024)} MB",
+                )
+            await search_executor.run(f.write, chunk)
+    return written
+
+
+def get_user_job(db: Session, job_id: int, user_id: int) -> IngestionJob:
+    job = db.query(IngestionJob).filter(IngestionJob.id == job_id, IngestionJob.user_id == user_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/upload_files", status_code=202)
+async def upload(
+                files: List[UploadFile] = File(...),
+                current_user: User = Depends(get_current_user),
+                db: Session = Depends(get_db)):
+    """
+    Store the uploaded files and queue them for indexing. Poll /upload_jobs/{job_id}
+    or follow /upload_jobs/{job_id}/events for progress.
+    """
     print(current_user)
     if not current_user:
         raise HTTPException(status_code=400, detail="User Is Not Signed In.")
-    
-    # Read all files at once into memory BEFORE the generator
-    file_contents = []
-    for file in files:
-        content = await file.read()
-        file_contents.append((file.filename, content))
-    
-    async def stream_chunks():
+
+    # The request body as a whole is capped by BodySizeLimitMiddleware (see app/main.py)
+    filenames = [Path(file.filename).name for file in files]
+
+    # Files go to a private directory first and only become a job once all are on disk
+    incoming_dir = job_dir(current_user.id, f"incoming-{uuid.uuid4().hex}")
+    incoming_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        budget = settings.UPLOAD_MAX_TOTAL_BYTES
+        for file, filename in zip(files, filenames):
+            budget -= await save_upload(file, incoming_dir / filename, budget)
+    except BaseException:
+        shutil.rmtree(incoming_dir, ignore_errors=True)
+        raise
+
+    job = create_job(db, current_user.id, filenames)
+    os.replace(incoming_dir, job_dir(current_user.id, job.id))
+    ingestion_worker.submit(job.id, current_user.id)
+    return {"job_id": job.id, "status": job.status}
+
+
+@router.get("/upload_jobs", response_model=List[IngestionJobOut])
+async def list_jobs(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    jobs = (
+        db.query(IngestionJob)
+        .filter(IngestionJob.user_id == current_user.id)
+        .order_by(IngestionJob.id.desc())
+        .limit(50)
+        .all()
+    )
+    return [job_to_dict(job) for job in jobs]
+
+
+@router.get("/upload_jobs/{job_id}", response_model=IngestionJobOut)
+async def get_job_status(job_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    return job_to_dict(get_user_job(db, job_id, current_user.id))
+
+
+@router.get("/upload_jobs/{job_id}/events")
+async def job_events(job_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Server-sent events with the job state, until the job finishes."""
+    get_user_job(db, job_id, current_user.id)
+
+    def event(state: dict) -> str:
+        return f"data: {json.dumps(IngestionJobOut(**state).model_dump(mode='json'))}\n\n"
+
+    async def stream_events():
+        queue = ingestion_worker.subscribe(job_id)
         try:
-            yield "Starting processing... 0%\n"
-
-            all_chunks = []
-            total_files = len(file_contents)
-            processed_files = 0
-
-            for filename, content in file_contents:
-                file_path = UPLOAD_DIR / filename
-                with open(file_path, "wb") as f:
-                    f.write(content)
-
-                progress = int((processed_files / total_files) * 30)  # File processing is 30% of total
-                yield f"Saved {filename}... {progress}%\n"
-
-                # Load file
-                if filename.endswith(".pdf"):
-                    loader = PyPDFLoader(str(file_path))
-                elif filename.endswith(".txt"):
-                    loader = TextLoader(str(file_path), encoding="utf-8")
-                else:
-                    yield f"Unsupported file type: {filename} {progress}%\n"
+            # Subscribed first, so no update between this read and the loop is missed
+            state = await run_in_threadpool(get_job, job_id)
+            yield event(state)
+            while state["status"] not in TERMINAL_STATUSES:
+                try:
+                    state = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
                     continue
-
-                docs = loader.load()
-                splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-                chunks = splitter.split_documents(docs)
-                all_chunks.extend(chunks)
-
-                processed_files += 1
-                progress = int((processed_files / total_files) * 30)
-                yield f"Split {filename} into {len(chunks)} chunks... {progress}%\n"
-
-            if not all_chunks:
-                yield "No valid documents to index. 30%\n"
-                return
-
-            # Create embeddings for chunks
-            yield "Generating embeddings... 40%\n"
-            embeddings_model = HuggingFaceEmbeddings()
-            texts = [chunk.page_content for chunk in all_chunks]
-            yield f"Generating {len(texts)} embeddings... 50%\n"
-            embeddings = embeddings_model.embed_documents(texts)
-            dim = len(embeddings[0])
-
-            yield "Creating FAISS index... 80%\n"
-            # Convert embeddings to float32 numpy array
-            embeddings_np = np.array(embeddings).astype("float32")
-
-            # Create FAISS index
-            index = faiss.IndexFlatL2(dim)
-            index.add(embeddings_np)
-
-            yield "Saving index... 90%\n"
-            Path("faiss_indecies").mkdir(exist_ok=True)
-            faiss.write_index(index, f"faiss_indecies/{current_user.id}.faiss")
-            with open(f"faiss_indecies/{current_user.id}.pkl", "wb") as f:
-                pickle.dump(chunks, f)
-            yield "All documents processed and indexed successfully. 100%\n"
-        
-        except Exception as e:
-            yield f"Error: {str(e)} 0%\n"
-
-    return StreamingResponse(stream_chunks(), media_type="text/plain")
\ No newline at end of file
+                yield event(state)
+        finally:
+            ingestion_worker.unsubscribe(job_id, queue)
+
+    return StreamingResponse(
+        stream_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"}
+    )
+
+
+@router.post("/upload_jobs/{job_id}/cancel", response_model=IngestionJobOut)
+async def cancel_job(job_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Cancel a job. A running job stops after the file it is currently indexing."""
+    job = get_user_job(db, job_id, current_user.id)
+    if job.status not in TERMINAL_STATUSES:
+        job.cancel_requested = True
+        if job.status == "queued":
+            job.status = "cancelled"
+            job.message = "Cancelled"
+        db.commit()
+        db.refresh(job)
+    return job_to_dict(job)
+
+
+@router.get("/documents")
+async def list_documents(current_user: User = Depends(get_current_user)):
+    user_index = await search_executor.run(UserIndex, current_user.id)
+    return [
+        {"filename": filename, "chunks": len(document["ids"])}
+        for filename, document in user_index.documents.items()
+    ]
+
+
+@router.delete("/documents/{filename}")
+async def delete_document(filename: str, current_user: User = Depends(get_current_user)):
+    async with user_lock(current_user.id):
+        user_index = await search_executor.run(UserIndex, current_user.id)
+        if not await search_executor.run(user_index.remove_document, filename):
+            raise HTTPException(status_code=404, detail="Document not found")
+        await search_executor.run(user_index.save)
+        index_cache.invalidate(str(user_index.index_file))
+        answer_cache.invalidate_user(current_user.id)
+
+    file_path = UPLOAD_DIR / str(current_user.id) / Path(filename).name
+    file_path.unlink(missing_ok=True)
+    return {"message": "Document deleted successfully"}
@@ -1,22 +1,29 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session as DBSession
-from sqlalchemy import func, desc, asc
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, desc, asc, and_, or_, select, delete
 from datetime import datetime, date
+import base64
+import json
 from typing import Optional, List
 from pydantic import BaseModel
 from app.models.user import User
-from app.models.log import QueryLog, UserSession
-from app.database.dependencies import get_db
+from app.models.log import QueryLog, QueryStageTiming, UserSession
+from app.models.rollup import SessionRollup, UserDailyRollup
+from app.utils.rollups import merged_rollup, merged_stages, remove_session_rollup
+from app.utils.active_sessions import active_sessions
+from app.database.dependencies import get_async_db
 from app.auth.dependencies import get_current_user
 from fastapi.exceptions import HTTPException
 
 router = APIRouter()
 
 class QueryResponse(BaseModel):
+    id: Optional[int] = None
     question: str
     response: Optional[str]
     response_time: Optional[float]
     timestamp: datetime
+    truncated: bool = False
 
 class SessionResponse(BaseModel):
     id: int
@@ -25,102 +32,247 @@ class SessionResponse(BaseModel):
     avg_response_time: Optional[float]
     total_response_time: Optional[float]
     queries: List[QueryResponse]
+    # Set when `queries` was cut at queries_limit; continue with /sessions/{id}/queries
+    next_queries_cursor: Optional[str] = None
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(*values) -> str:
+    """Opaque keyset cursor holding the sort key and id of the last row returned."""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def decode_cursor(cursor: str, *types) -> list:
+    """Values of a cursor from `encode_cursor`, one per type; any other cursor is a 400."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("wrong number of cursor fields")
+        decoded = []
+        for kind, value in zip(types, values):
+            if kind is datetime:
+                decoded.append(datetime.fromisoformat(value))
+            elif isinstance(value, kind) and not isinstance(value, bool):
+                decoded.append(value)
+            else:
+                raise TypeError(f"cursor field {value!r} is not {kind.__name__}")
+        return decoded
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def query_columns(preview_chars: Optional[int]):
+    """QueryLog columns for listings; with preview_chars the response is cut in the database."""
+    if preview_chars:
+        # One extra character tells whether the preview was truncated
+        response = func.substr(QueryLog.response, 1, preview_chars + 1)
+    else:
+        response = QueryLog.response
+    return [
+        QueryLog.id, QueryLog.session_id, QueryLog.question, response.label("response"),
+        QueryLog.response_time, QueryLog.timestamp,
+    ]
+
+def to_query_response(row, preview_chars: Optional[int]) -> QueryResponse:
+    response = row.response
+    truncated = bool(preview_chars) and response is not None and len(response) > preview_chars
+    return QueryResponse(
+        id=row.id,
+        question=row.question,
+        response=response[:preview_chars] if truncated else response,
+        response_time=row.response_time,
+        timestamp=row.timestamp,
+        truncated=truncated,
+    )
+
+async def fetch_session_queries(db: AsyncSession, session_ids: List[int], preview_chars: Optional[int],
+                          per_session_limit: Optional[int]) -> dict:
+    """Queries of all the given sessions in one round-trip, grouped by session id in time order."""
+    grouped = {session_id: [] for session_id in session_ids}
+    if not session_ids:
+        return grouped
+    columns = query_columns(preview_chars)
+    order = (QueryLog.session_id, QueryLog.timestamp, QueryLog.id)
+    if per_session_limit:
+        row_number = func.row_number().over(
+            partition_by=QueryLog.session_id, order_by=(QueryLog.timestamp, QueryLog.id)
+        ).label("row_number")
+        ranked = select(*columns, row_number).where(QueryLog.session_id.in_(session_ids)).subquery()
+        # Fetch one row past the limit to know whether more remain
+        query = (
+            select(ranked)
+            .where(ranked.c.row_number <= per_session_limit + 1)
+            .order_by(ranked.c.session_id, ranked.c.timestamp, ranked.c.id)
+        )
+    else:
+        query = select(*columns).where(QueryLog.session_id.in_(session_ids)).order_by(*order)
+    rows = (await db.execute(query)).all()
+    for row in rows:
+        grouped[row.session_id].append(row)
+    return grouped
 
 @router.get("/sessions", response_model=List[SessionResponse])
 async def get_sessions(
-    db: DBSession = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
     date_from: Optional[date] = Query(None, description="Filter sessions from this date"),
     date_to: Optional[date] = Query(None, description="Filter sessions to this date"),
     min_queries: Optional[int] = Query(None, ge=0, description="Minimum number of queries per session"),
     sort_by: Optional[str] = Query("date_desc", regex="^(date_desc|date_asc|queries_desc|queries_asc)$"),
-    limit: Optional[int] = Query(50, ge=1, le=100, description="Maximum number of sessions to return")
+    limit: Optional[int] = Query(50, ge=1, le=100, description="Maximum number of sessions to return"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    preview: bool = Query(False, description="Return truncated response previews instead of full bodies"),
+    preview_chars: int = Query(200, ge=1, le=5000, description="Preview length in characters"),
+    queries_limit: Optional[int] = Query(None, ge=0, description="Maximum number of queries returned per session")
 ):
     """
-    Get user sessions with optional filtering and sorting
+    Get user sessions with optional filtering and sorting.
+
+    Pages are chained with keyset cursors: when more sessions match, the
+    X-Next-Cursor response header holds the cursor for the next page.
     """
     
-    # Base query for sessions with query statistics
+    query_count = func.coalesce(SessionRollup.query_count, 0)
+    # Base query for sessions with query statistics, read from the session rollups
     query = (
-        db.query(
+        select(
             UserSession.id,
             UserSession.started_at,
-            func.count(QueryLog.id).label('query_count'),
-            func.avg(QueryLog.response_time).label('avg_response_time'),
-            func.sum(QueryLog.response_time).label('total_response_time')
+            query_count.label('query_count'),
+            (SessionRollup.total_response_time / SessionRollup.query_count).label('avg_response_time'),
+            SessionRollup.total_response_time.label('total_response_time')
         )
-        .outerjoin(QueryLog, UserSession.id == QueryLog.session_id)
-        .filter(UserSession.user_id == current_user.id)
-        .group_by(UserSession.id, UserSession.started_at)
+        .outerjoin(SessionRollup, UserSession.id == SessionRollup.session_id)
+        .where(UserSession.user_id == current_user.id)
     )
     
     # Apply date filters
     if date_from:
-        query = query.filter(UserSession.started_at >= datetime.combine(date_from, datetime.min.time()))
+        query = query.where(UserSession.started_at >= datetime.combine(date_from, datetime.min.time()))
     
     if date_to:
-        query = query.filter(UserSession.started_at <= datetime.combine(date_to, datetime.max.time()))
+        query = query.where(UserSession.started_at <= datetime.combine(date_to, datetime.max.time()))
     
     # Apply minimum queries filter
     if min_queries is not None:
-        query = query.having(func.count(QueryLog.id) >= min_queries)
+        query = query.where(query_count >= min_queries)
     
-    # Apply sorting
-    if sort_by == "date_desc":
-        query = query.order_by(desc(UserSession.started_at))
-    elif sort_by == "date_asc":
-        query = query.order_by(asc(UserSession.started_at))
-    elif sort_by == "queries_desc":
-        query = query.order_by(desc(func.count(QueryLog.id)))
-    elif sort_by == "queries_asc":
-        query = query.order_by(asc(func.count(QueryLog.id)))
+    # Apply sorting, with the session id as tie-breaker so the keyset is unique
+    by_date = sort_by.startswith("date")
+    descending = sort_by.endswith("desc")
+    sort_key = UserSession.started_at if by_date else query_count
+    direction = desc if descending else asc
+    query = query.order_by(direction(sort_key), direction(UserSession.id))
+
+    # Continue after the last row of the previous page
+    if cursor:
+        last_key, last_id = decode_cursor(cursor, datetime if by_date else int, int)
+        if descending:
+            after = or_(sort_key < last_key, and_(sort_key == last_key, UserSession.id < last_id))
+        else:
+            after = or_(sort_key > last_key, and_(sort_key == last_key, UserSession.id > last_id))
+        query = query.where(after)
     
-    # Apply limit
-    sessions_data = query.limit(limit).all()
+    # Apply limit, fetching one extra row to know whether another page exists
+    sessions_data = (await db.execute(query.limit(limit + 1))).all()
+    if len(sessions_data) > limit:
+        sessions_data = sessions_data[:limit]
+        last = sessions_data[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            last.started_at if by_date else last.query_count, last.id
+        )
     
-    # Build response with queries for each session
+    # Get the queries of all sessions in one batched fetch
+    preview_chars = preview_chars if preview else None
+    queries_by_session = await fetch_session_queries(
+        db, [session_data.id for session_data in sessions_data], preview_chars, queries_limit
+    )
+
     result = []
-    
     for session_data in sessions_data:
-        session_id = session_data.id
-        
-        # Get all queries for this session
-        queries = (
-            db.query(QueryLog)
-            .filter(QueryLog.session_id == session_id)
-            .order_by(QueryLog.timestamp)
-            .all()
-        )
-        
-        # Convert queries to response format
-        query_responses = [
-            QueryResponse(
-                question=query.question,
-                response=query.response,
-                response_time=query.response_time,
-                timestamp=query.timestamp
-            )
-            for query in queries
-        ]
+        queries = queries_by_session[session_data.id]
+        next_queries_cursor = None
+        if queries_limit is not None and len(queries) > queries_limit:
+            queries = queries[:queries_limit]
+            if queries:
+                next_queries_cursor = encode_cursor(queries[-1].timestamp, queries[-1].id)
         
         # Create session response
-        session_response = SessionResponse(
+        result.append(SessionResponse(
             id=session_data.id,
             started_at=session_data.started_at,
             query_count=session_data.query_count or 0,
             avg_response_time=float(session_data.avg_response_time) if session_data.avg_response_time else None,
             total_response_time=float(session_data.total_response_time) if session_data.total_response_time else None,
-            queries=query_responses
-        )
-        
-        result.append(session_response)
+            queries=[to_query_response(row, preview_chars) for row in queries],
+            next_queries_cursor=next_queries_cursor
+        ))
     
     return result
 
+@router.get("/sessions/{session_id}/queries", response_model=List[QueryResponse])
+async def get_session_queries(
+    session_id: int,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    limit: int = Query(50, ge=1, le=200, description="Maximum number of queries to return"),
+    preview: bool = Query(False, description="Return truncated response previews instead of full bodies"),
+    preview_chars: int = Query(200, ge=1, le=5000, description="Preview length in characters")
+):
+    """
+    Page through a session's queries in time order, using keyset cursors
+    (see the X-Next-Cursor response header).
+    """
+    owned = await db.scalar(
+        select(UserSession.id)
+        .where(UserSession.id == session_id, UserSession.user_id == current_user.id)
+    )
+    if not owned:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    preview_chars = preview_chars if preview else None
+    query = select(*query_columns(preview_chars)).where(QueryLog.session_id == session_id)
+    if cursor:
+        last_timestamp, last_id = decode_cursor(cursor, datetime, int)
+        query = query.where(or_(
+            QueryLog.timestamp > last_timestamp,
+            and_(QueryLog.timestamp == last_timestamp, QueryLog.id > last_id)
+        ))
+    rows = (await db.execute(query.order_by(QueryLog.timestamp, QueryLog.id).limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].timestamp, rows[-1].id)
+    return [to_query_response(row, preview_chars) for row in rows]
+
+@router.get("/sessions/{session_id}/queries/{query_id}", response_model=QueryResponse)
+async def get_session_query(
+    session_id: int,
+    query_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get one query with its full response body
+    """
+    row = (await db.execute(
+        select(*query_columns(None))
+        .join(UserSession, QueryLog.session_id == UserSession.id)
+        .where(
+            QueryLog.id == query_id,
+            QueryLog.session_id == session_id,
+            UserSession.user_id == current_user.id
+        )
+    )).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Query not found")
+    return to_query_response(row, None)
+
 @router.get("/sessions/{session_id}", response_model=SessionResponse)
 async def get_session_by_id(
     session_id: int,
-    db: DBSession = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -128,33 +280,30 @@ async def get_session_by_id(
     """
     
     # Get session with statistics
-    session_data = (
-        db.query(
+    session_data = (await db.execute(
+        select(
             UserSession.id,
             UserSession.started_at,
-            func.count(QueryLog.id).label('query_count'),
-            func.avg(QueryLog.response_time).label('avg_response_time'),
-            func.sum(QueryLog.response_time).label('total_response_time')
+            SessionRollup.query_count.label('query_count'),
+            (SessionRollup.total_response_time / SessionRollup.query_count).label('avg_response_time'),
+            SessionRollup.total_response_time.label('total_response_time')
         )
-        .outerjoin(QueryLog, UserSession.id == QueryLog.session_id)
-        .filter(
+        .outerjoin(SessionRollup, UserSession.id == SessionRollup.session_id)
+        .where(
             UserSession.id == session_id,
             UserSession.user_id == current_user.id
         )
-        .group_by(UserSession.id, UserSession.started_at)
-        .first()
-    )
+    )).first()
     
     if not session_data:
         raise HTTPException(status_code=404, detail="Session not found")
     
     # Get all queries for this session
-    queries = (
-        db.query(QueryLog)
-        .filter(QueryLog.session_id == session_id)
+    queries = (await db.scalars(
+        select(QueryLog)
+        .where(QueryLog.session_id == session_id)
         .order_by(QueryLog.timestamp)
-        .all()
-    )
+    )).all()
     
     # Convert queries to response format
     query_responses = [
@@ -180,7 +329,7 @@ async def get_session_by_id(
 @router.delete("/sessions/{session_id}")
 async def delete_session(
     session_id: int,
-    db: DBSession = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -188,30 +337,37 @@ async def delete_session(
     """
     
     # Check if session exists and belongs to current user
-    session = (
-        db.query(UserSession)
-        .filter(
+    session = await db.scalar(
+        select(UserSession)
+        .where(
             UserSession.id == session_id,
             UserSession.user_id == current_user.id
         )
-        .first()
     )
     
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    # Delete associated queries first (due to foreign key constraint)
-    db.query(QueryLog).filter(QueryLog.session_id == session_id).delete()
+    # Delete associated stage timings and queries first (due to foreign key constraints)
+    query_ids = select(QueryLog.id).where(QueryLog.session_id == session_id)
+    await db.execute(
+        delete(QueryStageTiming).where(QueryStageTiming.query_log_id.in_(query_ids)),
+        execution_options={"synchronize_session": False},
+    )
+    await db.execute(delete(QueryLog).where(QueryLog.session_id == session_id))
+    await db.run_sync(remove_session_rollup, session_id)
     
     # Delete the session
-    db.delete(session)
-    db.commit()
+    await db.delete(session)
+    await db.commit()
+    # Later questions must not be logged to the deleted session
+    active_sessions.discard(current_user.id, session_id)
     
     return {"message": "Session deleted successfully"}
 
 @router.get("/sessions/stats/summary")
 async def get_sessions_summary(
-    db: DBSession = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
     date_from: Optional[date] = Query(None),
     date_to: Optional[date] = Query(None)
@@ -221,46 +377,36 @@ async def get_sessions_summary(
     """
     
     # Base query for sessions
-    query = db.query(UserSession).filter(UserSession.user_id == current_user.id)
+    query = select(UserSession.id).where(UserSession.user_id == current_user.id)
     
     # Apply date filters
     if date_from:
-        query = query.filter(UserSession.started_at >= datetime.combine(date_from, datetime.min.time()))
+        query = query.where(UserSession.started_at >= datetime.combine(date_from, datetime.min.time()))
     
     if date_to:
-        query = query.filter(UserSession.started_at <= datetime.combine(date_to, datetime.max.time()))
+        query = query.where(UserSession.started_at <= datetime.combine(date_to, datetime.max.time()))
     
     # Get total sessions count
-    total_sessions = query.count()
+    total_sessions = await db.scalar(select(func.count()).select_from(query.subquery()))
     
-    # Get total queries and response time statistics
-    stats_query = (
-        db.query(
-            func.count(QueryLog.id).label('total_queries'),
-            func.avg(QueryLog.response_time).label('avg_response_time'),
-            func.min(QueryLog.response_time).label('min_response_time'),
-            func.max(QueryLog.response_time).label('max_response_time'),
-            func.sum(QueryLog.response_time).label('total_response_time')
-        )
-        .join(UserSession, QueryLog.session_id == UserSession.id)
-        .filter(UserSession.user_id == current_user.id)
-    )
-    
-    # Apply same date filters to queries
+    # Response time statistics and percentiles, merged from the user/day rollups
+    rollup_query = select(UserDailyRollup).where(UserDailyRollup.user_id == current_user.id)
     if date_from:
-        stats_query = stats_query.filter(UserSession.started_at >= datetime.combine(date_from, datetime.min.time()))
-    
+        rollup_query = rollup_query.where(UserDailyRollup.day >= date_from)
     if date_to:
-        stats_query = stats_query.filter(UserSession.started_at <= datetime.combine(date_to, datetime.max.time()))
-    
-    stats = stats_query.first()
+        rollup_query = rollup_query.where(UserDailyRollup.day <= date_to)
+    rollups = (await db.scalars(rollup_query)).all()
+    stats = merged_rollup(rollups)
     
     return {
         "total_sessions": total_sessions,
-        "total_queries": stats.total_queries or 0,
-        "avg_response_time": float(stats.avg_response_time) if stats.avg_response_time else None,
-        "min_response_time": float(stats.min_response_time) if stats.min_response_time else None,
-        "max_response_time": float(stats.max_response_time) if stats.max_response_time else None,
-        "total_response_time": float(stats.total_response_time) if stats.total_response_time else None,
-        "avg_queries_per_session": float(stats.total_queries / total_sessions) if total_sessions > 0 and stats.total_queries else 0
-    }
\ No newline at end of file
+        "total_queries": stats["query_count"],
+        "avg_response_time": stats["avg_response_time"],
+        "min_response_time": stats["min_response_time"],
+        "max_response_time": stats["max_response_time"],
+        "total_response_time": stats["total_response_time"] if stats["query_count"] else None,
+        "p50_response_time": stats["p50_response_time"],
+        "p95_response_time": stats["p95_response_time"],
+        "avg_queries_per_session": float(stats["query_count"] / total_sessions) if total_sessions > 0 and stats["query_count"] else 0,
+        "stages": merged_stages(rollups)
+    }
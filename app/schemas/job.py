@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+class JobFile(BaseModel):
+    filename: str
+    status: str
+
+class IngestionJobOut(BaseModel):
+    id: int
+    status: str
+    progress: int
+    message: Optional[str]
+    files: List[JobFile]
+    created_at: datetime
+    updated_at: datetime
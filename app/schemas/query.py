@@ -1,10 +1,17 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import Optional
+from app.config import settings
 
 class AskRequest(BaseModel):
     question: str
     chat_history: list
 
+class BatchAskRequest(BaseModel):
+    questions: list[str]
+    # Concurrent LLM calls; defaults to BATCH_ASK_CONCURRENCY
+    concurrency: Optional[int] = Field(None, ge=1, le=settings.BATCH_ASK_MAX_CONCURRENCY)
+
 class AskResponse(BaseModel):
     answer: str
 
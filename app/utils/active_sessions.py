@@ -0,0 +1,62 @@
+import time
+from collections import OrderedDict
+from app.config import settings
+
+
+class ActiveSessionCache:
+    """
+    Each user's active session id, so /ask finds it without a query.
+
+    A session stays active while the user keeps asking: every lookup slides its
+    expiry to `timeout_seconds` after that request. At most `max_entries`
+    users are kept (least recently active dropped first). The cache is per
+    process; a miss falls back to the database, which judges activity by the
+    session's last logged query.
+    """
+
+    def __init__(self, timeout_seconds: float, max_entries: int):
+        self.timeout_seconds = timeout_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int):
+        """The user's active session id, marking it used now, or None."""
+        entry = self._entries.get(user_id)
+        now = time.monotonic()
+        if entry is None or now - entry[1] > self.timeout_seconds:
+            self._entries.pop(user_id, None)
+            self.misses += 1
+            return None
+        self._entries[user_id] = (entry[0], now)
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, user_id: int, session_id: int):
+        self._entries[user_id] = (session_id, time.monotonic())
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, user_id: int, session_id: int):
+        """Forget a deleted session if it is the user's active one."""
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] == session_id:
+            del self._entries[user_id]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+active_sessions = ActiveSessionCache(
+    timeout_seconds=settings.SESSION_TIMEOUT_MINUTES * 60,
+    max_entries=settings.ACTIVE_SESSION_CACHE_MAX_ENTRIES,
+)
@@ -1,4 +1,4 @@
-from app.agent.client import client,MODEL_NAME
+from app.agent.gateway import llm_gateway
 
 async def stream_llm_response(question: str, context_str: list[str]):
     """
@@ -17,20 +17,11 @@ async def stream_llm_response(question: str, context_str: list[str]):
     },
     {
         "role": "user",
-        "content": f"Context:\n{"\n\n".join(context_str).strip()}\n\nQuestion: {question.strip()}",
+        "content": "Context:\n" + "\n\n".join(context_str).strip() + f"\n\nQuestion: {question.strip()}",
     },
 ]
 
 
-    # Use Azure OpenAI's acreate with stream=True
-    response = await client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=messages,
-        temperature=0.0,
-        stream=True,
-    )
-
-    # Stream tokens as they are received
-    async for chunk in response:
-        if chunk.choices and chunk.choices[0].delta.content:
-            yield chunk.choices[0].delta.content
+    # Stream tokens as they are received; the gateway retries until the first one
+    async for content in llm_gateway.stream_chat(messages, temperature=0.0):
+        yield content
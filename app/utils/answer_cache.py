@@ -0,0 +1,100 @@
+import time
+from collections import OrderedDict
+import numpy as np
+from app.config import settings
+
+
+class CachedAnswer:
+    def __init__(self, chunk_ids, vector, index_version, answer):
+        self.chunk_ids = chunk_ids
+        self.vector = vector
+        self.index_version = index_version
+        self.answer = answer
+        self.created_at = time.monotonic()
+
+
+class AnswerCache:
+    """
+    Per-user cache of generated answers.
+
+    An answer is reused when the retrieval returned the same chunks from the same
+    index version and the standalone question embedding is at least `threshold`
+    cosine-similar to the cached one. Entries expire after `ttl_seconds`; each
+    user keeps at most `max_entries` (least recently used dropped first).
+    """
+
+    def __init__(self, threshold: float, ttl_seconds: float, max_entries: int):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype="float32")
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, user_id, chunk_ids, vector, index_version):
+        entries = self._entries.get(user_id)
+        if not entries or vector is None:
+            self.misses += 1
+            return None
+
+        now = time.monotonic()
+        chunk_ids = tuple(sorted(chunk_ids))
+        vector = self._normalize(vector)
+        best_key, best_score = None, self.threshold
+        for key, entry in list(entries.items()):
+            if now - entry.created_at > self.ttl_seconds or entry.index_version != index_version:
+                del entries[key]
+                continue
+            if entry.chunk_ids != chunk_ids:
+                continue
+            score = float(np.dot(entry.vector, vector))
+            if score >= best_score:
+                best_key, best_score = key, score
+
+        if best_key is None:
+            self.misses += 1
+            return None
+        entries.move_to_end(best_key)
+        self.hits += 1
+        return entries[best_key].answer
+
+    def store(self, user_id, chunk_ids, vector, index_version, answer: str):
+        if vector is None:
+            return
+        entries = self._entries.setdefault(user_id, OrderedDict())
+        entry = CachedAnswer(tuple(sorted(chunk_ids)), self._normalize(vector), index_version, answer)
+        entries[id(entry)] = entry
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def invalidate_user(self, user_id):
+        self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self._entries),
+            "entries": sum(len(entries) for entries in self._entries.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def replay_chunks(answer: str, size: int = 16):
+    """Split a cached answer into small pieces so it streams like a live one."""
+    for start in range(0, len(answer), size):
+        yield answer[start:start + size]
+
+
+answer_cache = AnswerCache(
+    threshold=settings.ANSWER_CACHE_SIMILARITY,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+)
@@ -0,0 +1,83 @@
+import asyncio
+import time
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.database.dependencies import get_or_create_active_session
+from app.models.log import QueryLog
+from app.utils.agent_responder import stream_llm_response
+from app.utils.answer_cache import answer_cache
+from app.utils.context_packer import pack_context
+from app.utils.log_writer import query_log_writer
+from app.vectore_store.retriever import retrieve_batch
+
+
+async def answer_question(user_id, index: int, question: str, retrieval, semaphore: asyncio.Semaphore) -> dict:
+    """Answer one question of a batch from its retrieval result, collecting the full LLM response."""
+    started = time.time()
+    use_cache = settings.ANSWER_CACHE_ENABLED and bool(retrieval.ids)
+    cached = None
+    if use_cache:
+        cached = answer_cache.lookup(user_id, retrieval.ids, retrieval.query_vector, retrieval.index_version)
+
+    result = {"index": index, "question": question}
+    if cached is not None:
+        result.update(answer=cached, cached=True)
+    else:
+        answer = ""
+        try:
+            async with semaphore:
+                async for chunk in stream_llm_response(context_str=pack_context(retrieval), question=question):
+                    answer += chunk
+        except Exception as e:
+            result["error"] = str(e)
+        else:
+            result.update(answer=answer, cached=False)
+            if use_cache:
+                answer_cache.store(user_id, retrieval.ids, retrieval.query_vector, retrieval.index_version, answer)
+    result["response_time"] = round(time.time() - started, 3)
+    return result
+
+
+async def prepare_batch(db: AsyncSession, user_id, questions: list[str]):
+    """
+    Retrieval for every question (one batched embedding and one matrix search)
+    and the session the answers are logged to. Run before streaming starts, so
+    a saturated executor still surfaces as a 503.
+    """
+    retrievals = await retrieve_batch(user_id, questions)
+    session_id = await get_or_create_active_session(db, user_id)
+    await db.close()
+    return retrievals, session_id
+
+
+async def answer_batch(user_id, questions: list[str], retrievals: list, session_id: int, concurrency: int = None):
+    """
+    Answer many standalone questions for one user from their `prepare_batch` retrievals.
+
+    LLM calls run at most `concurrency` at a time. Results are yielded as they
+    complete (each carries its `index` in `questions`); answered questions go
+    to the background log writer, which inserts them in bulk.
+    """
+    concurrency = concurrency or settings.BATCH_ASK_CONCURRENCY
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [
+        asyncio.ensure_future(answer_question(user_id, index, question, retrieval, semaphore))
+        for index, (question, retrieval) in enumerate(zip(questions, retrievals))
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            if "error" not in result:
+                await query_log_writer.submit(QueryLog(
+                    user_id=user_id,
+                    question=result["question"],
+                    response=result["answer"],
+                    response_time=result["response_time"],
+                    timestamp=datetime.utcnow(),
+                    session_id=session_id,
+                ))
+            yield result
+    finally:
+        for task in tasks:
+            task.cancel()
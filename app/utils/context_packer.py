@@ -0,0 +1,117 @@
+import numpy as np
+from app.agent.tokens import estimate_tokens
+from app.config import settings
+
+# Longest and shortest chunk overlap looked for when merging neighbours
+MAX_OVERLAP_CHARS = 200
+MIN_OVERLAP_CHARS = 10
+
+
+def merge_overlap(first: str, second: str) -> str:
+    """Join two neighbouring chunks, dropping the text the splitter repeated in both."""
+    longest = min(len(first), len(second), MAX_OVERLAP_CHARS)
+    for size in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return first + "\n" + second
+
+
+class Passage:
+    def __init__(self, ids, text, vector, rank):
+        self.ids = ids
+        self.text = text
+        self.vector = vector
+        self.rank = rank
+
+
+def merge_adjacent(texts, ids, sources, vectors) -> list[Passage]:
+    """
+    Merge retrieved chunks that are consecutive in the same document.
+
+    Chunk IDs are handed out in order while a document is indexed, so
+    neighbours in a file have consecutive IDs. A merged passage keeps the best
+    rank of its chunks and the normalised mean of their vectors.
+    """
+    order = sorted(range(len(ids)), key=lambda i: (sources[i], ids[i]))
+    groups = []
+    for i in order:
+        last = groups[-1] if groups else None
+        if last and sources[last[-1]] == sources[i] and ids[i] == ids[last[-1]] + 1:
+            last.append(i)
+        else:
+            groups.append([i])
+
+    passages = []
+    for group in groups:
+        text = texts[group[0]]
+        for i in group[1:]:
+            text = merge_overlap(text, texts[i])
+        vector = None
+        if vectors is not None:
+            vector = vectors[group].mean(axis=0)
+            vector = vector / (np.linalg.norm(vector) or 1.0)
+        passages.append(Passage([ids[i] for i in group], text, vector, min(group)))
+    return sorted(passages, key=lambda passage: passage.rank)
+
+
+def mmr_order(passages: list[Passage], query_vector, lambda_mult: float) -> list[Passage]:
+    """Order passages by maximal marginal relevance; keeps retrieval order without vectors."""
+    if query_vector is None or not passages or any(passage.vector is None for passage in passages):
+        return passages
+    vectors = np.vstack([passage.vector for passage in passages])
+    query = query_vector / (np.linalg.norm(query_vector) or 1.0)
+    relevance = vectors @ query
+    similarity = vectors @ vectors.T
+
+    selected = []
+    remaining = list(range(len(passages)))
+    while remaining:
+        if selected:
+            redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining))
+        scores = lambda_mult * relevance[remaining] - (1 - lambda_mult) * redundancy
+        best = remaining[int(np.argmax(scores))]
+        selected.append(best)
+        remaining.remove(best)
+    return [passages[i] for i in selected]
+
+
+def pack_context(retrieval, token_budget: int = None, lambda_mult: float = None) -> list[str]:
+    """
+    Context passages for the LLM prompt from a RetrievalResult.
+
+    Overlapping neighbours are merged, passages are ordered by MMR using the
+    vectors returned with the search, and taken in that order while they fit
+    in the token budget. The first passage is truncated rather than dropped.
+    """
+    if retrieval is None or not retrieval.texts:
+        return []
+    token_budget = token_budget or settings.CONTEXT_TOKEN_BUDGET
+    lambda_mult = settings.CONTEXT_MMR_LAMBDA if lambda_mult is None else lambda_mult
+
+    passages = merge_adjacent(retrieval.texts, retrieval.ids, retrieval.sources or [""] * len(retrieval.ids), retrieval.vectors)
+    passages = mmr_order(passages, retrieval.query_vector, lambda_mult)
+
+    packed = []
+    seen = set()
+    remaining = token_budget
+    for passage in passages:
+        text = passage.text.strip()
+        if not text or text in seen:
+            continue
+        tokens = estimate_tokens(text)
+        if tokens > remaining:
+            if packed:
+                continue
+            text = text[:int(remaining * settings.CONTEXT_CHARS_PER_TOKEN)]
+            tokens = remaining
+        packed.append(text)
+        seen.add(text)
+        remaining -= tokens
+
+    print(
+        f"📦 Context: {len(retrieval.texts)} chunks -> {len(packed)} passages, "
+        f"~{sum(estimate_tokens(text) for text in retrieval.texts)} -> ~{token_budget - remaining} tokens"
+    )
+    return packed
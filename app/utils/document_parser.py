@@ -0,0 +1,81 @@
+import asyncio
+import threading
+from collections import deque
+from app.config import settings
+from app.utils.executors import parse_executor, run_when_free
+from app.utils.file_analyzer import count_pages, load_and_split_pages
+from app.utils.pdf_backends import resolve_backend
+
+PDF_BACKEND = resolve_backend(settings.PDF_BACKEND)
+
+
+class ParseStats:
+    """Pages parsed and worker seconds spent, per PDF backend (plain text counted as "text")."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def record(self, backend: str, pages: int, seconds: float):
+        with self._lock:
+            totals = self._totals.setdefault(backend, {"pages": 0, "seconds": 0.0})
+            totals["pages"] += pages
+            totals["seconds"] += seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                backend: {
+                    **totals,
+                    "pages_per_second": totals["pages"] / totals["seconds"] if totals["seconds"] else 0.0,
+                }
+                for backend, totals in self._totals.items()
+            }
+
+
+parse_stats = ParseStats()
+
+
+async def parse_files(files, window: int = None):
+    """
+    Parse several files concurrently, yielding `(key, start, end, pages, chunks)`
+    for every page range in file order and page order.
+
+    `files` is a list of `(key, path)`. Page ranges of all files are fanned out
+    across the parse process pool, with at most `window` ranges parsed ahead of
+    the consumer, so memory stays bounded however large the files are.
+    """
+    window = window or settings.PARSE_PREFETCH
+    page_counts = await asyncio.gather(*[
+        run_when_free(parse_executor, count_pages, str(path), PDF_BACKEND) for _, path in files
+    ])
+
+    def ranges():
+        for (key, path), pages in zip(files, page_counts):
+            for start in range(0, pages, settings.PARSE_PAGES_PER_TASK):
+                yield key, str(path), start, min(start + settings.PARSE_PAGES_PER_TASK, pages), pages
+
+    def submit(page_range):
+        _, path, start, end, _ = page_range
+        return asyncio.ensure_future(
+            run_when_free(parse_executor, load_and_split_pages, path, start, end, PDF_BACKEND)
+        )
+
+    upcoming = ranges()
+    in_flight = deque()
+    try:
+        for page_range in upcoming:
+            in_flight.append((page_range, submit(page_range)))
+            if len(in_flight) >= window:
+                break
+        while in_flight:
+            (key, path, start, end, pages), task = in_flight.popleft()
+            chunks, seconds = await task
+            parse_stats.record(PDF_BACKEND if path.endswith(".pdf") else "text", end - start, seconds)
+            next_range = next(upcoming, None)
+            if next_range is not None:
+                in_flight.append((next_range, submit(next_range)))
+            yield key, start, end, pages, chunks
+    finally:
+        for _, task in in_flight:
+            task.cancel()
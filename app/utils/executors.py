@@ -0,0 +1,105 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from app.config import settings
+
+
+class ExecutorSaturated(Exception):
+    """Raised when an executor's queue is full; surfaced to clients as a 503."""
+
+    def __init__(self, name: str):
+        super().__init__(f"The {name} workers are busy, please retry shortly.")
+        self.name = name
+
+
+class BoundedExecutor:
+    """
+    Runs blocking work off the event loop with a cap on queued plus running tasks.
+
+    Submitting beyond `max_pending` raises `ExecutorSaturated` instead of
+    growing an unbounded queue.
+    """
+
+    def __init__(self, name: str, factory, max_pending: int):
+        self.name = name
+        self.max_pending = max_pending
+        self._factory = factory
+        self._executor = None
+        self.pending = 0
+        self.rejected = 0
+
+    @property
+    def executor(self):
+        # Created on first use so process pools are not forked at import time
+        if self._executor is None:
+            self._executor = self._factory()
+        return self._executor
+
+    @property
+    def saturated(self) -> bool:
+        return self.pending >= self.max_pending
+
+    async def run(self, fn, *args, **kwargs):
+        if self.saturated:
+            self.rejected += 1
+            raise ExecutorSaturated(self.name)
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, partial(fn, *args, **kwargs))
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {"pending": self.pending, "max_pending": self.max_pending, "rejected": self.rejected}
+
+
+async def run_when_free(executor: BoundedExecutor, fn, *args):
+    """Background work waits for a saturated executor instead of failing."""
+    while True:
+        try:
+            return await executor.run(fn, *args)
+        except ExecutorSaturated:
+            await asyncio.sleep(1)
+
+
+# FAISS index loads, searches and writes, plus the file I/O around them
+search_executor = BoundedExecutor(
+    "search",
+    lambda: ThreadPoolExecutor(settings.SEARCH_WORKERS, thread_name_prefix="search"),
+    settings.SEARCH_MAX_PENDING,
+)
+
+# The embedding model lives in this process; torch releases the GIL while it runs
+embedding_executor = BoundedExecutor(
+    "embedding",
+    lambda: ThreadPoolExecutor(settings.EMBEDDING_WORKERS, thread_name_prefix="embedding"),
+    settings.EMBEDDING_MAX_PENDING,
+)
+
+# Document parsing is pure-Python and GIL-bound, so it gets its own processes
+parse_executor = BoundedExecutor(
+    "parse",
+    lambda: ProcessPoolExecutor(settings.PARSE_WORKERS or os.cpu_count()),
+    settings.PARSE_MAX_PENDING,
+)
+
+# bcrypt for signup/login; the C extension releases the GIL, so threads hash in parallel
+password_executor = BoundedExecutor(
+    "password",
+    lambda: ThreadPoolExecutor(settings.PASSWORD_WORKERS, thread_name_prefix="password"),
+    settings.PASSWORD_MAX_PENDING,
+)
+
+executors = [search_executor, embedding_executor, parse_executor, password_executor]
+
+
+def shutdown_executors():
+    for executor in executors:
+        executor.shutdown()
@@ -1,4 +1,8 @@
+import os
+import time
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+from app.utils.pdf_backends import count_pdf_pages, extract_pages
 def chunk_text(text, chunk_size=1024, overlap=100):
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
@@ -15,4 +19,48 @@ def chunk_docs(docs):
         chunks = chunk_text(doc["text"])  # your existing chunk_text function
         all_chunks.extend(chunks)
         sources.extend([doc["source"]] * len(chunks))
-    return all_chunks,sources
\ No newline at end of file
+    return all_chunks,sources
+
+# .txt files are parsed in blocks of about this many bytes, cut at line boundaries
+TEXT_BLOCK_BYTES = 256 * 1024
+
+
+def count_pages(file_path: str, backend: str = "pypdf") -> int:
+    """Number of parse units in a file: PDF pages, or text blocks for .txt files."""
+    if file_path.endswith(".pdf"):
+        return count_pdf_pages(file_path, backend)
+    return max(1, -(-os.path.getsize(file_path) // TEXT_BLOCK_BYTES))
+
+
+def _read_text_block(file_path: str, start: int, end: int) -> str:
+    """Whole lines starting within bytes [start, end), so no line or character is cut."""
+    lines = []
+    with open(file_path, "rb") as f:
+        if start:
+            f.seek(start - 1)
+            f.readline()
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            lines.append(line)
+    return b"".join(lines).decode("utf-8", errors="replace")
+
+
+def load_and_split_pages(file_path: str, start: int, end: int, backend: str = "pypdf"):
+    """
+    Parse pages [start, end) of a .pdf or .txt file into ~500 character chunks.
+    Runs in the parse worker processes, so only a few pages are held at once.
+    Returns the chunks and the seconds spent parsing.
+    """
+    started = time.perf_counter()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+    if file_path.endswith(".pdf"):
+        docs = [
+            Document(page_content=text, metadata={"source": file_path, "page": page})
+            for page, text in enumerate(extract_pages(file_path, start, end, backend), start=start)
+        ]
+    else:
+        text = _read_text_block(file_path, start * TEXT_BLOCK_BYTES, end * TEXT_BLOCK_BYTES)
+        docs = [Document(page_content=text, metadata={"source": file_path})]
+    return splitter.split_documents(docs), time.perf_counter() - started
@@ -0,0 +1,289 @@
+import asyncio
+import json
+import os
+import shutil
+import time
+from contextlib import aclosing
+from pathlib import Path
+from fastapi.concurrency import run_in_threadpool
+from app.database.session import SessionLocal
+from app.models.job import IngestionJob
+from app.utils.answer_cache import answer_cache
+from app.utils.document_parser import parse_files
+from app.utils.executors import embedding_executor, run_when_free, search_executor
+from app.vectore_store.embedder import embedding_service
+from app.vectore_store.index_cache import index_cache
+from app.vectore_store.user_index import UserIndex, file_sha256, user_lock
+from app.config import settings
+
+UPLOAD_DIR = Path("docs")
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+
+def job_dir(user_id, job_id) -> Path:
+    """Where a job's uploaded files wait until they are indexed."""
+    return UPLOAD_DIR / str(user_id) / "jobs" / str(job_id)
+
+
+def job_to_dict(job: IngestionJob) -> dict:
+    return {
+        "id": job.id,
+        "user_id": job.user_id,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "files": json.loads(job.files),
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
+
+
+def create_job(db, user_id: int, filenames: list[str]) -> IngestionJob:
+    job = IngestionJob(
+        user_id=user_id,
+        status="queued",
+        progress=0,
+        message="Queued",
+        files=json.dumps([{"filename": filename, "status": "queued"} for filename in filenames]),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_job(job_id: int):
+    db = SessionLocal()
+    try:
+        job = db.get(IngestionJob, job_id)
+        return job_to_dict(job) if job else None
+    finally:
+        db.close()
+
+
+def update_job(job_id: int, **fields) -> dict:
+    db = SessionLocal()
+    try:
+        job = db.get(IngestionJob, job_id)
+        if "files" in fields:
+            fields["files"] = json.dumps(fields["files"])
+        for key, value in fields.items():
+            setattr(job, key, value)
+        db.commit()
+        db.refresh(job)
+        return job_to_dict(job)
+    finally:
+        db.close()
+
+
+def is_cancel_requested(job_id: int) -> bool:
+    db = SessionLocal()
+    try:
+        return bool(db.query(IngestionJob.cancel_requested).filter(IngestionJob.id == job_id).scalar())
+    finally:
+        db.close()
+
+
+def unfinished_jobs() -> list[tuple[int, int]]:
+    """(job id, user id) of the jobs left queued or running, oldest first."""
+    db = SessionLocal()
+    try:
+        jobs = (
+            db.query(IngestionJob.id, IngestionJob.user_id)
+            .filter(IngestionJob.status.in_(["queued", "running"]))
+            .order_by(IngestionJob.id)
+            .all()
+        )
+        return [(job.id, job.user_id) for job in jobs]
+    finally:
+        db.close()
+
+
+def move_file(source: Path, destination: Path):
+    os.replace(source, destination)
+
+
+class IngestionWorker:
+    """
+    In-process pool of workers that index queued upload jobs.
+
+    Job state lives in the `ingestion_jobs` table: each file is marked done as
+    soon as it is indexed and saved, so jobs interrupted by a restart resume at
+    the first unfinished file. Subscribers receive every state change.
+
+    Each worker has its own queue and a user's jobs always go to the same
+    one, so they run one after another in submission order.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self._queues = []
+        self._tasks = []
+        self._listeners = {}
+
+    async def start(self):
+        self._queues = [asyncio.Queue() for _ in range(self.concurrency)]
+        for job_id, user_id in await run_in_threadpool(unfinished_jobs):
+            self.submit(job_id, user_id)
+        self._tasks = [asyncio.create_task(self._consume(queue)) for queue in self._queues]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, job_id: int, user_id: int):
+        self._queues[hash(user_id) % len(self._queues)].put_nowait(job_id)
+
+    def subscribe(self, job_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        self._listeners.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, job_id: int, queue: asyncio.Queue):
+        listeners = self._listeners.get(job_id, set())
+        listeners.discard(queue)
+        if not listeners:
+            self._listeners.pop(job_id, None)
+
+    async def update(self, job_id: int, **fields) -> dict:
+        state = await run_in_threadpool(update_job, job_id, **fields)
+        for queue in self._listeners.get(job_id, ()):
+            queue.put_nowait(state)
+        return state
+
+    async def _consume(self, queue: asyncio.Queue):
+        while True:
+            job_id = await queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Ingestion job {job_id} failed: {e}")
+                await self.update(job_id, status="failed", message=f"Error: {str(e)}")
+
+    async def _run(self, job_id: int):
+        job = await run_in_threadpool(get_job, job_id)
+        if job is None:
+            return
+        if job["status"] in TERMINAL_STATUSES:
+            # Cancelled while queued: its staged uploads are no longer needed
+            shutil.rmtree(job_dir(job["user_id"], job_id), ignore_errors=True)
+            return
+
+        user_id, files = job["user_id"], job["files"]
+        staging_dir = job_dir(user_id, job_id)
+        user_dir = UPLOAD_DIR / str(user_id)
+
+        async with user_lock(user_id):
+            await self.update(job_id, status="running", message="Starting processing...")
+            user_index = await run_when_free(search_executor, UserIndex, user_id)
+
+            # Settle unsupported, missing and unchanged files before parsing anything
+            to_parse = []
+            for file in files:
+                if file["status"] != "queued":
+                    continue  # finished before a restart
+                status, message, sha256 = await self._check_file(user_index, staging_dir / file["filename"])
+                if status:
+                    file["status"] = status
+                    await self.update(job_id, files=files, message=message)
+                else:
+                    to_parse.append((file, sha256))
+
+            # Files and their page ranges are parsed in parallel but indexed in order
+            started = time.perf_counter()
+            parsed_pages = 0
+            current = None
+            ranges = parse_files([(i, staging_dir / file["filename"]) for i, (file, _) in enumerate(to_parse)])
+            async with aclosing(ranges):
+                async for key, start, end, pages, chunks in ranges:
+                    if current is None or current["key"] != key:
+                        if current is not None:
+                            await self._finish_file(job_id, files, user_index, current, user_dir)
+                        if await run_in_threadpool(is_cancel_requested, job_id):
+                            await self.update(job_id, status="cancelled", message="Cancelled", files=files)
+                            shutil.rmtree(staging_dir, ignore_errors=True)
+                            return
+                        file, sha256 = to_parse[key]
+                        current = {"key": key, "file": file, "sha256": sha256, "batch": [], "indexed": 0}
+                        await run_when_free(search_executor, user_index.remove_document, file["filename"])
+
+                    await self._add_chunks(user_index, current, chunks)
+                    parsed_pages += end - start
+                    elapsed = time.perf_counter() - started
+                    await self.update(
+                        job_id,
+                        progress=int((key + end / pages) / len(to_parse) * 100),
+                        message=(
+                            f"Indexed {current['indexed']} chunks from {current['file']['filename']} "
+                            f"(page {end} of {pages}, {parsed_pages / elapsed:.1f} pages/s)..."
+                        ),
+                    )
+            if current is not None:
+                await self._finish_file(job_id, files, user_index, current, user_dir)
+            for file, _ in to_parse:
+                if file["status"] == "queued":
+                    file["status"] = "skipped"  # no pages at all
+
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        indexed = sum(file["status"] == "done" for file in files)
+        await self.update(
+            job_id, status="completed", progress=100, files=files,
+            message=f"All documents processed, {indexed} of {len(files)} indexed.",
+        )
+
+    async def _check_file(self, user_index, staged_path: Path):
+        """Status and message for files that need no parsing, plus the file hash."""
+        filename = staged_path.name
+        if not filename.endswith(SUPPORTED_EXTENSIONS):
+            return "skipped", f"Unsupported file type: {filename}", None
+        if not staged_path.exists():
+            return "failed", f"{filename} is missing from the upload staging area", None
+
+        sha256 = await run_when_free(search_executor, file_sha256, staged_path)
+        if user_index.has_document(filename, sha256):
+            staged_path.unlink(missing_ok=True)
+            return "skipped", f"{filename} is unchanged, skipping...", sha256
+        return None, None, sha256
+
+    async def _add_chunks(self, user_index, current: dict, chunks: list):
+        # Embedded and indexed in fixed-size batches, so memory is bounded by the batch size
+        current["batch"].extend(chunks)
+        while len(current["batch"]) >= settings.INGEST_BATCH_SIZE:
+            batch = current["batch"][:settings.INGEST_BATCH_SIZE]
+            current["batch"] = current["batch"][settings.INGEST_BATCH_SIZE:]
+            current["indexed"] += await self._index_batch(user_index, current["file"]["filename"], batch)
+
+    async def _finish_file(self, job_id, files, user_index, current: dict, user_dir: Path):
+        file = current["file"]
+        filename = file["filename"]
+        if current["batch"]:
+            current["indexed"] += await self._index_batch(user_index, filename, current["batch"])
+            current["batch"] = []
+
+        if not current["indexed"]:
+            file["status"], message = "skipped", f"No text found in {filename}"
+        else:
+            user_index.finish_document(filename, current["sha256"])
+            # Saved per file so a restarted job never repeats finished work
+            await run_when_free(search_executor, user_index.save)
+            index_cache.invalidate(str(user_index.index_file))
+            answer_cache.invalidate_user(user_index.user_id)
+            staged_path = job_dir(user_index.user_id, job_id) / filename
+            await run_when_free(search_executor, move_file, staged_path, user_dir / filename)
+            file["status"], message = "done", f"Indexed {filename} ({current['indexed']} chunks)"
+        await self.update(job_id, files=files, message=message)
+
+    async def _index_batch(self, user_index, filename: str, chunks: list) -> int:
+        embeddings = await run_when_free(
+            embedding_executor, embedding_service.embed_chunks, [chunk.page_content for chunk in chunks]
+        )
+        await run_when_free(search_executor, user_index.add_chunks, filename, chunks, embeddings)
+        return len(chunks)
+
+
+ingestion_worker = IngestionWorker(concurrency=settings.INGESTION_WORKERS)
@@ -0,0 +1,156 @@
+import asyncio
+import time
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import OperationalError
+from app.config import settings
+from app.database.session import SessionLocal
+from app.models.log import QueryLog
+from app.utils.rollups import is_deadlock, update_rollups
+
+# Attempts per row, after its batch failed, before the row is dropped (with a message)
+ROW_ATTEMPTS = 3
+# Pause before retrying after a deadlock, multiplied by the attempt number
+DEADLOCK_BACKOFF_SECONDS = 0.05
+
+
+def is_retryable(error: Exception) -> bool:
+    """Lock conflicts (deadlocks, lock wait timeouts) and lost connections are worth another try."""
+    return is_deadlock(error) or isinstance(error, OperationalError)
+
+
+class QueryLogWriter:
+    """
+    Background writer for QueryLog rows.
+
+    Requests hand their (unattached) log rows to a bounded in-process queue and
+    return immediately. A single task drains the queue and inserts the rows,
+    with their stage timings and rollup updates, in one transaction per batch:
+    a batch is written once `batch_size` rows are waiting or `flush_interval_ms`
+    after its first row arrived. A deadlocked batch is retried once; a batch
+    that still fails is retried row by row, so only the rows that fail are
+    dropped. When the queue is full, submitters wait.
+    """
+
+    def __init__(self, max_queue: int, batch_size: int, flush_interval_ms: float):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue = None
+        self._task = None
+        self.counters = {"submitted": 0, "written": 0, "batches": 0, "failed": 0, "blocked": 0}
+        self.last_flush_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        self._queue = asyncio.Queue(self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Write everything still queued, then stop."""
+        if not self.running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def submit(self, log: QueryLog):
+        self.counters["submitted"] += 1
+        if not self.running:
+            # No writer (e.g. the batch API used outside the app): write right away
+            await run_in_threadpool(self._write, [log])
+            return
+        if self._queue.full():
+            self.counters["blocked"] += 1
+        await self._queue.put(log)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[QueryLog]):
+        try:
+            await run_in_threadpool(self._write, batch)
+            return
+        except Exception as e:
+            error = e
+        if is_deadlock(error):
+            # Rollup rows are locked FOR UPDATE; the conflicting writer is usually done by now
+            print(f"⚠️ Writing {len(batch)} query logs deadlocked, retrying the batch")
+            await asyncio.sleep(DEADLOCK_BACKOFF_SECONDS)
+            try:
+                await run_in_threadpool(self._write, batch)
+                return
+            except Exception as e:
+                error = e
+        print(f"❌ Writing {len(batch)} query logs failed, writing them one by one: {error}")
+        # One bad row (e.g. its session was deleted meanwhile) must not take the batch with it
+        for log in batch:
+            for attempt in range(1, ROW_ATTEMPTS + 1):
+                try:
+                    await run_in_threadpool(self._write, [log])
+                    break
+                except Exception as e:
+                    if attempt == ROW_ATTEMPTS or not is_retryable(e):
+                        print(f"❌ Dropping query log of session {log.session_id}: {e}")
+                        self.counters["failed"] += 1
+                        break
+                    await asyncio.sleep(DEADLOCK_BACKOFF_SECONDS * attempt)
+
+    def _write(self, batch: list[QueryLog]):
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            db.add_all(batch)
+            update_rollups(db, batch)
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Let a retry add the rows to a fresh session
+            db.expunge_all()
+            raise
+        finally:
+            db.close()
+        self.counters["written"] += len(batch)
+        self.counters["batches"] += 1
+        self.last_flush_seconds = time.perf_counter() - started
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "queue_depth": self.depth,
+            "max_queue": self.max_queue,
+            "last_flush_seconds": round(self.last_flush_seconds, 4),
+        }
+
+
+query_log_writer = QueryLogWriter(
+    max_queue=settings.LOG_QUEUE_MAX,
+    batch_size=settings.LOG_FLUSH_BATCH_SIZE,
+    flush_interval_ms=settings.LOG_FLUSH_INTERVAL_MS,
+)
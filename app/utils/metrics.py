@@ -0,0 +1,86 @@
+import threading
+
+# Seconds; covers sub-millisecond cache hits up to slow LLM streams
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram rendered in the Prometheus text format."""
+
+    def __init__(self, name: str, help_text: str, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.setdefault(label_values, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                names = self.label_names + ("le",)
+                for bound, count in zip(self.buckets, series["counts"]):
+                    lines.append(f"{self.name}_bucket{_labels(names, label_values + (bound,))} {count}")
+                lines.append(f"{self.name}_bucket{_labels(names, label_values + ('+Inf',))} {series['count']}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, label_values)} {series['sum']}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, label_values)} {series['count']}")
+        return lines
+
+
+class Gauge:
+    """Gauge read from a callback at scrape time; the callback returns a number or {label value: number}."""
+
+    def __init__(self, name: str, help_text: str, read, label_name: str = None):
+        self.name = name
+        self.help = help_text
+        self.read = read
+        self.label_name = label_name
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        value = self.read()
+        if isinstance(value, dict):
+            for label_value, number in sorted(value.items()):
+                lines.append(f"{self.name}{_labels((self.label_name,), (label_value,))} {number}")
+        else:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+ask_stage_seconds = registry.register(Histogram(
+    "qa_rag_ask_stage_seconds", "Duration of each /ask stage in seconds.", ("stage",)
+))
@@ -1,4 +1,9 @@
-from app.agent.client import client,MODEL_NAME
+import hashlib
+import json
+import re
+from collections import OrderedDict
+from app.agent.gateway import llm_gateway
+from app.config import settings
 
 SYSTEM_MESSAGE= """You are an AI assistant that rephrases user follow-up questions into complete, standalone questions.
 
@@ -16,10 +21,79 @@ def chat_history_handler(chat_history: list[str]):
         messages.append({"role": "assistant", "content": message['assistant_message']})
     return messages
 
+# Words that usually point back into the conversation ("what about its price?")
+FOLLOW_UP_WORDS = {
+    "it", "its", "it's", "this", "that", "these", "those", "they", "them", "their", "theirs",
+    "he", "him", "his", "she", "her", "hers", "there", "here", "one", "ones", "former", "latter",
+    "above", "previous", "earlier", "same", "also", "else", "more", "again", "another", "other",
+}
+FOLLOW_UP_OPENERS = ("and ", "but ", "so ", "what about", "how about", "why not", "then ")
+MIN_SELF_CONTAINED_WORDS = 4
+
+rewrite_stats = {
+    "calls": 0,
+    "skipped_empty_history": 0,
+    "skipped_self_contained": 0,
+    "cache_hits": 0,
+    "llm_calls": 0,
+}
+_rewrite_cache = OrderedDict()
+
+
+def is_self_contained(user_input: str) -> bool:
+    """Cheap local check for questions that cannot depend on the conversation."""
+    text = user_input.strip().lower()
+    words = re.findall(r"[\w']+", text)
+    if len(words) < MIN_SELF_CONTAINED_WORDS or text.startswith(FOLLOW_UP_OPENERS):
+        return False
+    return not FOLLOW_UP_WORDS.intersection(words)
+
+
+def rewrite_cache_key(user_input: str, chat_history: list) -> str:
+    history = json.dumps(chat_history, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(f"{history}\x00{user_input}".encode("utf-8")).hexdigest()
+
+
 async def chat_history_analyzer(user_input: str, chat_history: list[str]):
     """
-    Async generator that streams response from Azure OpenAI ChatCompletion
+    Rephrase a follow-up question into a standalone one. The LLM is skipped when
+    there is no history or the question is already self-contained, and rewrites
+    are cached by history and question.
     """
+    rewrite_stats["calls"] += 1
+    if not chat_history:
+        rewrite_stats["skipped_empty_history"] += 1
+        return user_input
+    if settings.REWRITE_SKIP_SELF_CONTAINED and is_self_contained(user_input):
+        rewrite_stats["skipped_self_contained"] += 1
+        return user_input
+
+    key = rewrite_cache_key(user_input, chat_history)
+    if key in _rewrite_cache:
+        _rewrite_cache.move_to_end(key)
+        rewrite_stats["cache_hits"] += 1
+        return _rewrite_cache[key]
+
+    rewrite_stats["llm_calls"] += 1
+    rewritten = await rewrite_with_llm(user_input, chat_history)
+    _rewrite_cache[key] = rewritten
+    while len(_rewrite_cache) > settings.REWRITE_CACHE_SIZE:
+        _rewrite_cache.popitem(last=False)
+    return rewritten
+
+
+def get_rewrite_stats() -> dict:
+    calls = rewrite_stats["calls"]
+    skipped = rewrite_stats["skipped_empty_history"] + rewrite_stats["skipped_self_contained"]
+    return {
+        **rewrite_stats,
+        "skip_rate": skipped / calls if calls else 0.0,
+        "cache_hit_rate": rewrite_stats["cache_hits"] / (calls - skipped) if calls > skipped else 0.0,
+        "cache_size": len(_rewrite_cache),
+    }
+
+
+async def rewrite_with_llm(user_input: str, chat_history: list[str]):
     messages = [
         {
             "role": "system",
@@ -29,11 +103,4 @@ async def chat_history_analyzer(user_input: str, chat_history: list[str]):
     messages.extend(history_messages)
     messages.append({"role": "user", "content": user_input})
 
-    # Use Azure OpenAI's acreate with stream=True
-    response = await client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=messages,
-        temperature=0.0,
-    )
-
-    return response.choices[0].message.content
+    return await llm_gateway.complete(messages, hedge=settings.LLM_HEDGE_REWRITES, temperature=0.0)
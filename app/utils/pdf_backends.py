@@ -0,0 +1,68 @@
+"""
+PDF text extraction backends. Each backend returns the text of pages [start, end).
+
+PyMuPDF is the fastest; pypdf is pure Python and always available as a fallback.
+"""
+
+
+def _pymupdf_pages(file_path: str, start: int, end: int) -> list[str]:
+    import fitz
+    with fitz.open(file_path) as pdf:
+        return [pdf[page].get_text() for page in range(start, min(end, pdf.page_count))]
+
+
+def _pymupdf_count(file_path: str) -> int:
+    import fitz
+    with fitz.open(file_path) as pdf:
+        return pdf.page_count
+
+
+def _pypdf_pages(file_path: str, start: int, end: int) -> list[str]:
+    from pypdf import PdfReader
+    reader = PdfReader(file_path)
+    return [reader.pages[page].extract_text() or "" for page in range(start, min(end, len(reader.pages)))]
+
+
+def _pypdf_count(file_path: str) -> int:
+    from pypdf import PdfReader
+    return len(PdfReader(file_path).pages)
+
+
+def _pdfplumber_pages(file_path: str, start: int, end: int) -> list[str]:
+    import pdfplumber
+    with pdfplumber.open(file_path) as pdf:
+        return [pdf.pages[page].extract_text() or "" for page in range(start, min(end, len(pdf.pages)))]
+
+
+def _pdfplumber_count(file_path: str) -> int:
+    import pdfplumber
+    with pdfplumber.open(file_path) as pdf:
+        return len(pdf.pages)
+
+
+PDF_BACKENDS = {
+    "pymupdf": (_pymupdf_pages, _pymupdf_count, "fitz"),
+    "pypdf": (_pypdf_pages, _pypdf_count, "pypdf"),
+    "pdfplumber": (_pdfplumber_pages, _pdfplumber_count, "pdfplumber"),
+}
+FALLBACK_BACKEND = "pypdf"
+
+
+def resolve_backend(name: str) -> str:
+    """The configured backend if it is installed, otherwise the pypdf fallback."""
+    if name not in PDF_BACKENDS:
+        raise ValueError(f"Unknown PDF backend {name!r}, expected one of {', '.join(PDF_BACKENDS)}")
+    try:
+        __import__(PDF_BACKENDS[name][2])
+        return name
+    except ImportError:
+        print(f"⚠️ PDF backend {name} is not installed, falling back to {FALLBACK_BACKEND}")
+        return FALLBACK_BACKEND
+
+
+def extract_pages(file_path: str, start: int, end: int, backend: str) -> list[str]:
+    return PDF_BACKENDS[backend][0](file_path, start, end)
+
+
+def count_pdf_pages(file_path: str, backend: str) -> int:
+    return PDF_BACKENDS[backend][1](file_path)
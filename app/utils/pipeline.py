@@ -0,0 +1,132 @@
+import asyncio
+import time
+from collections import deque
+from app.utils.executors import ExecutorSaturated
+from app.utils.metrics import ask_stage_seconds
+from app.utils.orchestrator import chat_history_analyzer
+from app.vectore_store.retriever import retrieve
+
+
+class StageTimer:
+    """Wall-clock duration of each /ask stage, in seconds, measured from one start time."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.durations = {}
+
+    def stage(self, name: str):
+        return _Stage(self, name)
+
+    def mark(self, name: str):
+        """Record the time elapsed since the request started (e.g. time-to-first-token)."""
+        self.durations[name] = time.perf_counter() - self.start
+
+    def as_dict(self) -> dict:
+        return {name: round(seconds, 4) for name, seconds in self.durations.items()}
+
+
+class _Stage:
+    def __init__(self, timer: StageTimer, name: str):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.durations[self.name] = time.perf_counter() - self.started
+        return False
+
+
+class StageStats:
+    """Recent stage durations, to see which stage is on the critical path."""
+
+    def __init__(self, window: int = 1000):
+        self._samples = {}
+        self.window = window
+
+    def record(self, durations: dict):
+        for name, seconds in durations.items():
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(seconds)
+
+    def stats(self) -> dict:
+        result = {}
+        for name, samples in self._samples.items():
+            ordered = sorted(samples)
+            result[name] = {
+                "count": len(ordered),
+                "p50": ordered[len(ordered) // 2],
+                "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            }
+        return result
+
+
+stage_stats = StageStats()
+
+
+def record_stages(durations: dict):
+    """Feed a request's stage durations to /stats and the /metrics histograms."""
+    stage_stats.record(durations)
+    for name, seconds in durations.items():
+        ask_stage_seconds.observe(seconds, name)
+
+
+class PreparedAsk:
+    def __init__(self, question, retrieval, session_id, speculative_hit):
+        self.question = question
+        self.retrieval = retrieval
+        self.session_id = session_id
+        self.speculative_hit = speculative_hit
+
+
+async def _timed(timer: StageTimer, name: str, awaitable):
+    with timer.stage(name):
+        return await awaitable
+
+
+async def _retrieve_or_none(user_id, question):
+    try:
+        return await retrieve(user_id, question)
+    except ExecutorSaturated:
+        raise
+    except Exception as e:
+        print(f"❌ Retrieval failed: {e}")
+        return None
+
+
+async def prepare_ask(user_id, question: str, chat_history: list, find_session, timer: StageTimer) -> PreparedAsk:
+    """
+    Everything /ask needs before the answer stream, with independent stages overlapped.
+
+    The question rewrite, the session lookup (`find_session`, a callable returning
+    an awaitable of the session id) and a speculative retrieval on the raw
+    question run concurrently. The speculative result is kept when the rewrite
+    leaves the question unchanged; otherwise retrieval runs again on the
+    rewritten question.
+    """
+    rewrite = asyncio.ensure_future(_timed(timer, "rewrite", chat_history_analyzer(question, chat_history)))
+    session = asyncio.ensure_future(_timed(timer, "session_lookup", find_session()))
+    speculative = asyncio.ensure_future(
+        _timed(timer, "retrieval_speculative", _retrieve_or_none(user_id, question))
+    )
+    try:
+        rewritten = await rewrite
+        if rewritten.strip() == question.strip():
+            retrieval = await speculative
+            speculative_hit = True
+        else:
+            speculative.cancel()
+            retrieval = await _timed(timer, "retrieval", _retrieve_or_none(user_id, rewritten))
+            speculative_hit = False
+        session_id = await session
+    except BaseException:
+        for task in (rewrite, session, speculative):
+            task.cancel()
+        raise
+
+    if retrieval is not None:
+        # Index load / embedding / search split of the retrieval that was kept
+        timer.durations.update(retrieval.timings)
+    timer.mark("prepared")
+    return PreparedAsk(rewritten, retrieval, session_id, speculative_hit)
@@ -0,0 +1,81 @@
+import json
+import math
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with bounded relative error (DDSketch-style).
+
+    Positive values are counted in logarithmic buckets, so any quantile comes
+    back within `relative_accuracy` of the true value. Two sketches merge by
+    adding bucket counts, which lets rollup rows be combined in any order.
+    Response times from 1ms to 10 minutes need at most ~330 buckets at 2%.
+    """
+
+    MIN_VALUE = 1e-6
+
+    def __init__(self, relative_accuracy: float = 0.02, buckets: dict = None, zero_count: int = 0):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = buckets or {}
+        self.zero_count = zero_count
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.buckets.values())
+
+    def add(self, value: float, count: int = 1):
+        if value <= self.MIN_VALUE:
+            self.zero_count += count
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + count
+
+    def merge(self, other: "QuantileSketch"):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        self.zero_count += other.zero_count
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        return self
+
+    def quantile(self, q: float):
+        """
+        Approximate q-quantile (0 <= q <= 1), or None for an empty sketch.
+
+        Nearest-rank: the value at 1-based rank ceil(q * count), as the raw
+        per-stage percentiles were computed before the rollups.
+        """
+        total = self.count
+        if not total:
+            return None
+        # The epsilon keeps e.g. 0.95 * 100 from rounding up to rank 96
+        rank = max(1, math.ceil(q * total - 1e-9))
+        seen = self.zero_count
+        if rank <= seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank <= seen:
+                # Midpoint of the bucket (gamma^(key-1), gamma^key] in relative terms
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "accuracy": self.relative_accuracy,
+            "zero": self.zero_count,
+            "buckets": {str(key): count for key, count in self.buckets.items()},
+        })
+
+    @classmethod
+    def from_json(cls, text: str) -> "QuantileSketch":
+        if not text:
+            return cls()
+        data = json.loads(text)
+        return cls(
+            relative_accuracy=data["accuracy"],
+            buckets={int(key): count for key, count in data["buckets"].items()},
+            zero_count=data["zero"],
+        )
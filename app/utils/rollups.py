@@ -0,0 +1,225 @@
+import json
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.orm import Session as DBSession
+from app.models.log import QueryLog, QueryStageTiming, UserSession
+from app.models.rollup import SessionRollup, UserDailyRollup
+from app.utils.quantile_sketch import QuantileSketch
+
+
+# MySQL deadlock / lock wait timeout, PostgreSQL deadlock_detected
+_DEADLOCK_CODES = {1213, 1205, "40P01"}
+
+
+def is_deadlock(error: Exception) -> bool:
+    """Whether `error` is a deadlock (or lock wait timeout) worth retrying the transaction for."""
+    if not isinstance(error, DBAPIError) or error.orig is None:
+        return False
+    orig = error.orig
+    code = getattr(orig, "errno", None) or getattr(orig, "pgcode", None) or (orig.args[0] if orig.args else None)
+    return code in _DEADLOCK_CODES or "deadlock" in str(orig).lower()
+
+
+def _empty(model, **key):
+    return model(
+        **key, query_count=0, total_response_time=0.0,
+        min_response_time=None, max_response_time=None, sketch=QuantileSketch().to_json(),
+    )
+
+
+def _locked_row(db: DBSession, model, key: dict, extra: dict = None):
+    """The rollup row for `key`, locked for update and created when missing."""
+    row = db.query(model).filter_by(**key).with_for_update().first()
+    if row is None:
+        try:
+            # A concurrent writer may create the same row; only the savepoint is lost then
+            with db.begin_nested():
+                row = _empty(model, **key, **(extra or {}))
+                db.add(row)
+        except IntegrityError:
+            row = db.query(model).filter_by(**key).with_for_update().first()
+    return row
+
+
+def _fold(row, sketch: QuantileSketch, count: int, total: float, low: float, high: float):
+    merged = QuantileSketch.from_json(row.sketch).merge(sketch)
+    row.sketch = merged.to_json()
+    row.query_count += count
+    row.total_response_time += total
+    row.min_response_time = low if row.min_response_time is None else min(row.min_response_time, low)
+    row.max_response_time = high if row.max_response_time is None else max(row.max_response_time, high)
+
+
+def _fold_stages(row, stages: dict):
+    merged = {
+        stage: QuantileSketch.from_json(text) for stage, text in json.loads(row.stage_sketches or "{}").items()
+    }
+    for stage, sketch in stages.items():
+        merged[stage] = merged[stage].merge(sketch) if stage in merged else sketch
+    row.stage_sketches = json.dumps({stage: sketch.to_json() for stage, sketch in merged.items()})
+
+
+class _Partial:
+    """Statistics of a group of response times before they are folded into a rollup row."""
+
+    def __init__(self):
+        self.sketch = QuantileSketch()
+        self.count = 0
+        self.total = 0.0
+        self.low = None
+        self.high = None
+        self.stages = {}
+
+    def add_stage(self, stage: str, seconds: float):
+        self.stages.setdefault(stage, QuantileSketch()).add(seconds)
+
+    def add(self, value: float):
+        self.sketch.add(value)
+        self.count += 1
+        self.total += value
+        self.low = value if self.low is None else min(self.low, value)
+        self.high = value if self.high is None else max(self.high, value)
+
+    def fold_into(self, row):
+        if self.count:
+            _fold(row, self.sketch, self.count, self.total, self.low, self.high)
+        if self.stages:
+            _fold_stages(row, self.stages)
+
+
+def update_rollups(db: DBSession, logs: list[QueryLog]):
+    """
+    Fold new QueryLog rows into their session and user/day rollups.
+
+    Call it in the transaction that inserts the logs so both commit together.
+    Rows are locked in key order, which rules out lock-order deadlocks, but on
+    InnoDB two transactions creating the same missing row can still deadlock
+    on gap locks. Callers retry when `is_deadlock` says so, as the query log
+    writer and scripts/backfill_rollups.py do.
+    """
+    if not logs:
+        return
+    session_ids = {log.session_id for log in logs}
+    started = dict(db.query(UserSession.id, UserSession.started_at).filter(UserSession.id.in_(session_ids)).all())
+
+    per_session, per_day = {}, {}
+    for log in logs:
+        if log.session_id not in started:
+            continue  # session deleted while its question was answered; the insert fails on its own
+        day = started[log.session_id].date()
+        per_session.setdefault((log.session_id, log.user_id, day), _Partial()).add(log.response_time)
+        daily = per_day.setdefault((log.user_id, day), _Partial())
+        daily.add(log.response_time)
+        for timing in log.stage_timings:
+            daily.add_stage(timing.stage, timing.seconds)
+
+    for (session_id, user_id, day), partial in sorted(per_session.items()):
+        partial.fold_into(_locked_row(db, SessionRollup, {"session_id": session_id}, {"user_id": user_id, "day": day}))
+    for (user_id, day), partial in sorted(per_day.items()):
+        partial.fold_into(_locked_row(db, UserDailyRollup, {"user_id": user_id, "day": day}))
+
+
+def remove_session_rollup(db: DBSession, session_id: int):
+    """
+    Drop a deleted session's rollup and re-merge its day from the remaining
+    sessions. Stage sketches are only kept per day, so the deleted session's
+    stage timings stay in them until the next backfill.
+    """
+    rollup = db.query(SessionRollup).filter(SessionRollup.session_id == session_id).first()
+    if rollup is None:
+        return
+    user_id, day = rollup.user_id, rollup.day
+    db.delete(rollup)
+    db.flush()
+
+    daily = _locked_row(db, UserDailyRollup, {"user_id": user_id, "day": day})
+    remaining = db.query(SessionRollup).filter(SessionRollup.user_id == user_id, SessionRollup.day == day).all()
+    if not remaining:
+        db.delete(daily)
+        return
+    fresh = _empty(UserDailyRollup, user_id=user_id, day=day)
+    for row in remaining:
+        _fold(fresh, QuantileSketch.from_json(row.sketch), row.query_count, row.total_response_time,
+              row.min_response_time, row.max_response_time)
+    for column in ("query_count", "total_response_time", "min_response_time", "max_response_time", "sketch"):
+        setattr(daily, column, getattr(fresh, column))
+
+
+def merged_stages(rows) -> dict:
+    """Approximate per-stage p50/p95/p99 over several daily rollup rows."""
+    merged = {}
+    for row in rows:
+        for stage, text in json.loads(row.stage_sketches or "{}").items():
+            sketch = QuantileSketch.from_json(text)
+            merged[stage] = merged[stage].merge(sketch) if stage in merged else sketch
+    return {
+        stage: {
+            "count": sketch.count,
+            "p50": sketch.quantile(0.5),
+            "p95": sketch.quantile(0.95),
+            "p99": sketch.quantile(0.99),
+        }
+        for stage, sketch in sorted(merged.items())
+    }
+
+
+def merged_rollup(rows) -> dict:
+    """Totals, min/max and approximate percentiles over several rollup rows."""
+    sketch = QuantileSketch()
+    count, total, low, high = 0, 0.0, None, None
+    for row in rows:
+        if not row.query_count:
+            continue
+        sketch.merge(QuantileSketch.from_json(row.sketch))
+        count += row.query_count
+        total += row.total_response_time
+        low = row.min_response_time if low is None else min(low, row.min_response_time)
+        high = row.max_response_time if high is None else max(high, row.max_response_time)
+    return {
+        "query_count": count,
+        "total_response_time": total,
+        "avg_response_time": total / count if count else None,
+        "min_response_time": low,
+        "max_response_time": high,
+        "p50_response_time": sketch.quantile(0.5),
+        "p95_response_time": sketch.quantile(0.95),
+    }
+
+
+def rebuild_user_rollups(db: DBSession, user_id: int, batch_size: int = 5000) -> int:
+    """Recompute all rollups of one user from the raw query logs; returns the number of logs read."""
+    db.query(SessionRollup).filter(SessionRollup.user_id == user_id).delete(synchronize_session=False)
+    db.query(UserDailyRollup).filter(UserDailyRollup.user_id == user_id).delete(synchronize_session=False)
+
+    rows = (
+        db.query(QueryLog.session_id, UserSession.started_at, QueryLog.response_time)
+        .join(UserSession, QueryLog.session_id == UserSession.id)
+        .filter(UserSession.user_id == user_id)
+        .yield_per(batch_size)
+    )
+    per_session, per_day = {}, {}
+    read = 0
+    for session_id, started_at, response_time in rows:
+        day = started_at.date()
+        per_session.setdefault((session_id, day), _Partial()).add(response_time)
+        per_day.setdefault(day, _Partial()).add(response_time)
+        read += 1
+
+    timings = (
+        db.query(UserSession.started_at, QueryStageTiming.stage, QueryStageTiming.seconds)
+        .join(QueryLog, QueryStageTiming.query_log_id == QueryLog.id)
+        .join(UserSession, QueryLog.session_id == UserSession.id)
+        .filter(UserSession.user_id == user_id)
+        .yield_per(batch_size)
+    )
+    for started_at, stage, seconds in timings:
+        per_day.setdefault(started_at.date(), _Partial()).add_stage(stage, seconds)
+
+    for (session_id, day), partial in per_session.items():
+        row = _empty(SessionRollup, session_id=session_id, user_id=user_id, day=day)
+        partial.fold_into(row)
+        db.add(row)
+    for day, partial in per_day.items():
+        row = _empty(UserDailyRollup, user_id=user_id, day=day)
+        partial.fold_into(row)
+        db.add(row)
+    return read
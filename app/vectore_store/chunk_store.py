@@ -0,0 +1,189 @@
+import json
+import os
+import shutil
+from pathlib import Path
+import numpy as np
+
+# Column files, all rows in vector ID order
+IDS_FILE = "ids.i64"
+OFFSETS_FILE = "offsets.i64"  # rows + 1 byte offsets into the text blob
+SOURCES_FILE = "sources.i32"  # index into meta["sources"]
+PAGES_FILE = "pages.i32"  # -1 when the loader gives no page
+BLOB_FILE = "text.bin"
+META_FILE = "meta.json"
+
+
+def _read_meta(directory: Path) -> dict:
+    with open(directory / META_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_meta(directory: Path, meta: dict):
+    tmp_meta = directory / (META_FILE + ".tmp")
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta, directory / META_FILE)
+
+
+def _map(path: Path, dtype, length: int) -> np.ndarray:
+    if length == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(length,))
+
+
+class ChunkStore:
+    """
+    Read-only, memory-mapped view of a user's chunks.
+
+    Texts are kept in one UTF-8 blob addressed by an offsets column, next to
+    id/source/page columns. Nothing is read until a row is looked up, so a
+    search only touches the top_k rows it returns.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        meta = _read_meta(self.directory)
+        self.rows = meta["rows"]
+        self.sources = meta["sources"]
+        self.ids = _map(self.directory / IDS_FILE, "int64", self.rows)
+        self.offsets = _map(self.directory / OFFSETS_FILE, "int64", self.rows + 1)
+        self.source_ids = _map(self.directory / SOURCES_FILE, "int32", self.rows)
+        self.pages = _map(self.directory / PAGES_FILE, "int32", self.rows)
+        self.blob = _map(self.directory / BLOB_FILE, "uint8", int(self.offsets[-1]) if self.rows else 0)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes that end up resident for lookups (the id and offset columns)."""
+        return self.ids.nbytes + self.offsets.nbytes
+
+    def _row(self, chunk_id: int):
+        row = int(np.searchsorted(self.ids, chunk_id))
+        if row < self.rows and self.ids[row] == chunk_id:
+            return row
+        return None
+
+    def text(self, row: int) -> str:
+        return bytes(self.blob[self.offsets[row]:self.offsets[row + 1]]).decode("utf-8")
+
+    def get(self, chunk_ids) -> list[dict]:
+        """Rows for the given vector IDs, in the same order; unknown IDs are skipped."""
+        results = []
+        for chunk_id in chunk_ids:
+            row = self._row(int(chunk_id))
+            if row is None:
+                continue
+            page = int(self.pages[row])
+            results.append({
+                "id": int(chunk_id),
+                "text": self.text(row),
+                "source": self.sources[self.source_ids[row]],
+                "page": page if page >= 0 else None,
+            })
+        return results
+
+    def texts(self, chunk_ids) -> list[str]:
+        return [row["text"] for row in self.get(chunk_ids)]
+
+
+def append_chunks(directory, chunk_ids, texts, sources, pages):
+    """
+    Append rows to the store at `directory`, creating it if needed.
+    IDs must be larger than any ID already stored.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    if (directory / META_FILE).exists():
+        meta = _read_meta(directory)
+    else:
+        meta = {"rows": 0, "sources": []}
+    rows = meta["rows"]
+
+    new_ids = np.asarray(chunk_ids, dtype="int64")
+    if len(new_ids):
+        last_id = int(_map(directory / IDS_FILE, "int64", rows)[-1]) if rows else -1
+        if new_ids[0] <= last_id or np.any(np.diff(new_ids) <= 0):
+            raise ValueError(f"Chunk IDs must be increasing and larger than the last stored ID ({last_id})")
+
+    source_index = {source: i for i, source in enumerate(meta["sources"])}
+    source_ids = []
+    for source in sources:
+        if source not in source_index:
+            source_index[source] = len(meta["sources"])
+            meta["sources"].append(source)
+        source_ids.append(source_index[source])
+
+    encoded = [text.encode("utf-8") for text in texts]
+    blob_end = 0
+    if rows:
+        blob_end = int(_map(directory / OFFSETS_FILE, "int64", rows + 1)[-1])
+    offsets = blob_end + np.cumsum([len(data) for data in encoded], dtype="int64")
+    if not rows:
+        offsets = np.concatenate([[0], offsets]).astype("int64")
+
+    # Columns are truncated to the committed length first, so an interrupted
+    # append never leaves garbage rows behind; meta.json is written last.
+    committed = {
+        IDS_FILE: rows * 8,
+        OFFSETS_FILE: (rows + 1) * 8 if rows else 0,
+        SOURCES_FILE: rows * 4,
+        PAGES_FILE: rows * 4,
+        BLOB_FILE: blob_end,
+    }
+    columns = {
+        IDS_FILE: new_ids.tobytes(),
+        OFFSETS_FILE: offsets.tobytes(),
+        SOURCES_FILE: np.asarray(source_ids, dtype="int32").tobytes(),
+        PAGES_FILE: np.asarray(pages, dtype="int32").tobytes(),
+        BLOB_FILE: b"".join(encoded),
+    }
+    for name, data in columns.items():
+        path = directory / name
+        with open(path, "r+b" if path.exists() else "wb") as f:
+            f.truncate(committed[name])
+            f.seek(committed[name])
+            f.write(data)
+
+    meta["rows"] = rows + len(encoded)
+    _write_meta(directory, meta)
+
+
+def truncate_chunks(directory, next_id: int) -> int:
+    """
+    Drop the rows with IDs >= `next_id`, e.g. appended by a writer that failed
+    before saving its index. Returns the number of rows dropped.
+    """
+    directory = Path(directory)
+    if not (directory / META_FILE).exists():
+        return 0
+    store = ChunkStore(directory)
+    keep = int(np.searchsorted(store.ids, next_id))
+    dropped = store.rows - keep
+    if dropped:
+        meta = _read_meta(directory)
+        meta["rows"] = keep
+        # The column bytes past the new length are cut by the next append
+        _write_meta(directory, meta)
+    return dropped
+
+
+def compact(directory, live_ids):
+    """Rewrite the store keeping only `live_ids`, dropping deleted rows."""
+    directory = Path(directory)
+    store = ChunkStore(directory)
+    live_ids = np.unique(np.asarray(list(live_ids), dtype="int64"))
+    rows = store.get(live_ids)
+
+    tmp_dir = directory.with_name(directory.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    append_chunks(
+        tmp_dir,
+        [row["id"] for row in rows],
+        [row["text"] for row in rows],
+        [row["source"] for row in rows],
+        [-1 if row["page"] is None else row["page"] for row in rows],
+    )
+    old_dir = directory.with_name(directory.name + ".old")
+    shutil.rmtree(old_dir, ignore_errors=True)
+    os.replace(directory, old_dir)
+    os.replace(tmp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
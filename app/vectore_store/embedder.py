@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import numpy as np
+from langchain.embeddings import HuggingFaceEmbeddings
+from app.config import settings
+from app.utils.executors import ExecutorSaturated, embedding_executor
+from app.vectore_store.embedding_cache import EmbeddingCache, text_hash
+
+
+class EmbeddingService:
+    """
+    Process-wide embedding model that is loaded once and kept resident.
+
+    Query embeddings coming from concurrent requests are queued and merged
+    into a single batched forward pass every `batch_window_ms` milliseconds
+    (or as soon as `max_batch_size` queries are waiting).
+    """
+
+    def __init__(self, model_name: str, batch_window_ms: float = 10, max_batch_size: int = 64,
+                 cache: EmbeddingCache = None):
+        self.model_name = model_name
+        self.cache = cache
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._queue = None
+        self._worker = None
+
+    @property
+    def model(self) -> HuggingFaceEmbeddings:
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    print(f"Loading embedding model {self.model_name}...")
+                    self._model = HuggingFaceEmbeddings(model_name=self.model_name)
+        return self._model
+
+    def load(self):
+        """Load the model eagerly and run one warm-up pass."""
+        self.model.embed_documents(["warm up"])
+
+    def embed_documents(self, texts: list[str]) -> np.ndarray:
+        """Blocking batch embedding, returns a float32 array of shape (n, dim)."""
+        if not texts:
+            return np.empty((0, 0), dtype="float32")
+        return np.asarray(self.model.embed_documents(texts), dtype="float32")
+
+    def embed_chunks(self, texts: list[str]) -> np.ndarray:
+        """
+        Blocking batch embedding for ingestion. Chunks embedded before (by any
+        user or upload) are served from the persistent embedding cache.
+        """
+        if self.cache is None or not texts:
+            return self.embed_documents(texts)
+
+        hashes = [text_hash(text) for text in texts]
+        cached = self.cache.get_many(self.model_name, hashes)
+        missing = {}
+        for text, key in zip(texts, hashes):
+            if key not in cached:
+                missing.setdefault(key, text)
+
+        if missing:
+            computed = self.embed_documents(list(missing.values()))
+            self.cache.put_many(self.model_name, list(missing), computed)
+            cached.update(zip(missing, computed))
+        return np.stack([cached[key] for key in hashes]).astype("float32", copy=False)
+
+    async def embed_query(self, text: str) -> np.ndarray:
+        """Embed a single query, batched together with other in-flight queries."""
+        self._ensure_worker()
+        if self._queue.qsize() >= embedding_executor.max_pending:
+            raise ExecutorSaturated(embedding_executor.name)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._batch_loop())
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            batch = [(text, future) for text, future in batch if not future.cancelled()]
+            if not batch:
+                continue
+            try:
+                # Queries skip the pending cap, which only bounds ingestion work
+                vectors = await loop.run_in_executor(
+                    embedding_executor.executor, self.embed_documents, [text for text, _ in batch]
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+
+embedding_service = EmbeddingService(
+    model_name=settings.EMBEDDING_MODEL_NAME,
+    batch_window_ms=settings.EMBEDDING_BATCH_WINDOW_MS,
+    max_batch_size=settings.EMBEDDING_MAX_BATCH_SIZE,
+    cache=EmbeddingCache(settings.EMBEDDING_CACHE_DIR),
+)
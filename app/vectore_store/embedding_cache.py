@@ -0,0 +1,119 @@
+import hashlib
+import re
+import sqlite3
+import threading
+from pathlib import Path
+import numpy as np
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by (model id, chunk text hash).
+
+    Vectors of each model are appended to a raw float32 file that is read
+    through a memory map; a SQLite table maps every key to its row.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self._connection = None
+        self._lock = threading.Lock()
+        self._maps = {}
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened on first use (under self._lock), so importing the app creates no files
+        if self._connection is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.directory / "embeddings.sqlite"), check_same_thread=False)
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS models (
+                    model TEXT PRIMARY KEY,
+                    dim INTEGER NOT NULL,
+                    rows INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    row INTEGER NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                );
+                """
+            )
+            self._connection = connection
+        return self._connection
+
+    def _vectors_file(self, model: str) -> Path:
+        return self.directory / (re.sub(r"[^A-Za-z0-9_.-]", "_", model) + ".f32")
+
+    def _model_info(self, model: str):
+        return self._conn.execute("SELECT dim, rows FROM models WHERE model = ?", (model,)).fetchone()
+
+    def _vectors(self, model: str, dim: int, rows: int) -> np.ndarray:
+        mapped = self._maps.get(model)
+        if mapped is None or mapped.shape[0] < rows:
+            mapped = np.memmap(self._vectors_file(model), dtype="float32", mode="r", shape=(rows, dim))
+            self._maps[model] = mapped
+        return mapped
+
+    def _lookup_rows(self, model: str, hashes: list[str]) -> dict:
+        rows = {}
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows.update(self._conn.execute(
+                f"SELECT text_hash, row FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [model, *batch],
+            ).fetchall())
+        return rows
+
+    def get_many(self, model: str, hashes: list[str]) -> dict:
+        """Return {text_hash: vector} for the hashes that are cached."""
+        with self._lock:
+            info = self._model_info(model)
+            if info is None or not hashes:
+                return {}
+            found = self._lookup_rows(model, hashes)
+            if not found:
+                return {}
+            vectors = self._vectors(model, *info)
+            return {key: np.array(vectors[row]) for key, row in found.items()}
+
+    def put_many(self, model: str, hashes: list[str], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if not len(hashes):
+            return
+        with self._lock:
+            info = self._model_info(model)
+            dim, rows = info if info else (vectors.shape[1], 0)
+            if vectors.shape[1] != dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match cached dimension {dim}")
+
+            new_rows = dict(zip(hashes, vectors))
+            for key in self._lookup_rows(model, list(new_rows)):
+                del new_rows[key]
+            if not new_rows:
+                return
+
+            # Drop any bytes past the last committed row (e.g. from an interrupted write)
+            vectors_file = self._vectors_file(model)
+            with open(vectors_file, "r+b" if vectors_file.exists() else "wb") as f:
+                f.truncate(rows * dim * 4)
+                f.seek(rows * dim * 4)
+                f.write(np.stack(list(new_rows.values())).tobytes())
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO embeddings (model, text_hash, row) VALUES (?, ?, ?)",
+                    [(model, key, rows + i) for i, key in enumerate(new_rows)],
+                )
+                self._conn.execute(
+                    "INSERT INTO models (model, dim, rows) VALUES (?, ?, ?) "
+                    "ON CONFLICT(model) DO UPDATE SET rows = excluded.rows",
+                    (model, dim, rows + len(new_rows)),
+                )
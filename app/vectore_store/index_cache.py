@@ -0,0 +1,96 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import faiss
+from app.config import settings
+from app.vectore_store.chunk_store import ChunkStore, META_FILE
+from app.vectore_store.index_factory import apply_search_params
+
+
+class CachedIndex:
+    def __init__(self, index, chunks, version, nbytes):
+        self.index = index
+        self.chunks = chunks
+        self.version = version
+        self.nbytes = nbytes
+
+
+def file_version(*paths):
+    """(mtime_ns, size) of every file, used to detect on-disk changes."""
+    version = []
+    for path in paths:
+        stat = os.stat(path)
+        version.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(version)
+
+
+class IndexCache:
+    """
+    LRU cache of loaded FAISS indexes and their chunk stores, keyed by index file.
+
+    Entries are reloaded when the files' mtime/size change and the least
+    recently used entries are evicted once the total size exceeds `max_bytes`.
+    Entry size is the index file size plus the chunk store's resident columns;
+    chunk texts are memory-mapped and not counted.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, index_file: str, store_dir: str) -> CachedIndex:
+        version = file_version(index_file, Path(store_dir) / META_FILE)
+        with self._lock:
+            entry = self._entries.get(index_file)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(index_file)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        index = apply_search_params(faiss.read_index(index_file))
+        chunks = ChunkStore(store_dir)
+        entry = CachedIndex(index, chunks, version, version[0][1] + chunks.nbytes)
+
+        with self._lock:
+            self._entries[index_file] = entry
+            self._entries.move_to_end(index_file)
+            self._evict()
+        return entry
+
+    def invalidate(self, index_file: str):
+        with self._lock:
+            self._entries.pop(index_file, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self):
+        total = sum(entry.nbytes for entry in self._entries.values())
+        # Always keep the most recent entry, even if it alone exceeds the budget
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            total -= entry.nbytes
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(entry.nbytes for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+index_cache = IndexCache(max_bytes=settings.INDEX_CACHE_MAX_BYTES)
@@ -0,0 +1,143 @@
+import math
+import time
+import faiss
+import numpy as np
+from app.config import settings
+
+FLAT = "flat"
+IVF = "ivf"
+HNSW = "hnsw"
+IVFPQ = "ivfpq"
+
+# Rebuild a trained index once it holds this many times the vectors it was trained on
+RETRAIN_GROWTH = 4
+
+
+def choose_index_kind(ntotal: int) -> str:
+    """Index type for a corpus of `ntotal` vectors."""
+    if ntotal < settings.INDEX_IVF_MIN_VECTORS:
+        return FLAT
+    if ntotal < settings.INDEX_PQ_MIN_VECTORS:
+        return HNSW if settings.INDEX_LARGE_TYPE == HNSW else IVF
+    return IVFPQ
+
+
+def index_kind(index) -> str:
+    if isinstance(index, faiss.IndexIDMap):
+        index = index.index
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVFPQ):
+        return IVFPQ
+    if isinstance(index, faiss.IndexIVF):
+        return IVF
+    if isinstance(index, faiss.IndexHNSW):
+        return HNSW
+    return FLAT
+
+
+def supports_remove(index) -> bool:
+    return index_kind(index) != HNSW
+
+
+def has_exact_vectors(index) -> bool:
+    """Whether reconstruct() returns the original vectors (PQ codes are lossy)."""
+    return index_kind(index) != IVFPQ
+
+
+def needs_rebuild(index, trained_on: int) -> bool:
+    """True when the index type no longer fits its size or its training set is stale."""
+    ntotal = index.ntotal
+    kind, wanted = index_kind(index), choose_index_kind(ntotal)
+    if kind != wanted:
+        # Shrinking corpora only fall back to a smaller index well below the threshold,
+        # so deleting a few documents around a boundary does not trigger rebuilds.
+        order = [FLAT, IVF, HNSW, IVFPQ]
+        if order.index(wanted) > order.index(kind):
+            return True
+        return choose_index_kind(ntotal * 2) == wanted
+    return kind in (IVF, IVFPQ) and ntotal > trained_on * RETRAIN_GROWTH
+
+
+def _nlist(ntotal: int) -> int:
+    # ~4*sqrt(n) lists, with at least 39 training points per centroid
+    return max(1, min(int(4 * math.sqrt(ntotal)), ntotal // 39))
+
+
+def _pq_subquantizers(dim: int) -> int:
+    # 8 dimensions per sub-quantizer, falling back to the nearest divisor of dim
+    m = max(1, dim // 8)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def build_index(vectors: np.ndarray, ids: np.ndarray, kind: str = None):
+    """Build (and train, where needed) an index of `kind` holding `vectors` under `ids`."""
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    ids = np.ascontiguousarray(ids, dtype="int64")
+    ntotal, dim = vectors.shape
+    kind = kind or choose_index_kind(ntotal)
+
+    if kind == HNSW:
+        hnsw = faiss.IndexHNSWFlat(dim, settings.INDEX_HNSW_M)
+        hnsw.hnsw.efConstruction = settings.INDEX_HNSW_EF_CONSTRUCTION
+        index = faiss.IndexIDMap2(hnsw)
+    elif kind in (IVF, IVFPQ):
+        quantizer = faiss.IndexFlatL2(dim)
+        if kind == IVF:
+            index = faiss.IndexIVFFlat(quantizer, dim, _nlist(ntotal))
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, _nlist(ntotal), _pq_subquantizers(dim), 8)
+        # The quantizer is owned by the IVF index once it is built
+        quantizer.this.disown()
+        index.own_fields = True
+        index.train(vectors)
+        # Needed by reconstruct() for arbitrary IDs
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    else:
+        index = faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+
+    if ntotal:
+        index.add_with_ids(vectors, ids)
+    apply_search_params(index)
+    return index
+
+
+def apply_search_params(index):
+    """Apply the configured search-time knobs (nprobe / efSearch)."""
+    inner = index.index if isinstance(index, faiss.IndexIDMap) else index
+    kind = index_kind(index)
+    if kind in (IVF, IVFPQ):
+        faiss.extract_index_ivf(inner).nprobe = settings.INDEX_NPROBE
+    elif kind == HNSW:
+        faiss.downcast_index(inner).hnsw.efSearch = settings.INDEX_HNSW_EF_SEARCH
+    return index
+
+
+def measure_recall(index, vectors: np.ndarray, ids: np.ndarray, queries: np.ndarray, k: int = 10) -> dict:
+    """
+    recall@k of `index` against an exact flat index over the same vectors,
+    along with the mean search latency of both.
+    """
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    exact = faiss.IndexIDMap2(faiss.IndexFlatL2(vectors.shape[1]))
+    exact.add_with_ids(np.ascontiguousarray(vectors, dtype="float32"), np.ascontiguousarray(ids, dtype="int64"))
+
+    start = time.perf_counter()
+    _, expected = exact.search(queries, k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    _, found = index.search(queries, k)
+    index_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    hits = sum(len(set(e[e >= 0]) & set(f[f >= 0])) for e, f in zip(expected, found))
+    total = sum(len(e[e >= 0]) for e in expected)
+    return {
+        "kind": index_kind(index),
+        "k": k,
+        "queries": len(queries),
+        "recall": hits / total if total else 1.0,
+        "search_ms": index_ms,
+        "exact_search_ms": exact_ms,
+    }
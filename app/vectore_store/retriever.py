@@ -1,62 +1,149 @@
-import faiss
 import numpy as np
 import os
-import pickle
-from langchain.embeddings import HuggingFaceEmbeddings
+import time
+from app.utils.executors import ExecutorSaturated, embedding_executor, search_executor
+from app.vectore_store.embedder import embedding_service
+from app.vectore_store.index_factory import has_exact_vectors
+from app.vectore_store.index_cache import index_cache
+from app.vectore_store.user_index import UserIndex, index_paths, user_lock
 
 
-async def get_relevant_chunks(user_id: str, question: str):
-    
-    
-    index_path = f"{user_id}.faiss"
-    chunks_path = f"{user_id}.pkl"
-    try:
-        chunks = await retrieve_chunks(
-            query=question,
-            index_path=index_path,
-            chunks_path=chunks_path,
-            top_k=9
+class RetrievalResult:
+    """
+    Retrieved chunk texts with their vector IDs, plus the query vector and index version used.
+
+    `sources` and `vectors` (reconstructed from the index, None where it can't)
+    are row-aligned with `texts` for the context packing stage. `timings` holds
+    the seconds spent loading the index, embedding the query and searching.
+    """
+
+    def __init__(self, texts=None, ids=None, query_vector=None, index_version=None, sources=None, vectors=None,
+                 timings=None):
+        self.texts = texts or []
+        self.ids = ids or []
+        self.query_vector = query_vector
+        self.index_version = index_version
+        self.sources = sources or []
+        self.vectors = vectors
+        self.timings = timings or {}
+
+
+async def retrieve(user_id, question: str, top_k: int = 9) -> RetrievalResult:
+    await migrate_legacy_index(user_id)
+    return await retrieve_chunks(
+        query=question,
+        index_path=f"{user_id}.faiss",
+        chunks_path=f"{user_id}.chunks",
+        top_k=top_k
+    )
+
+
+async def retrieve_batch(user_id, questions: list[str], top_k: int = 9) -> list[RetrievalResult]:
+    """Retrieve for many questions at once: one embedding batch and one index search."""
+    await migrate_legacy_index(user_id)
+    index_file, store_dir, _ = index_paths(user_id)
+    if not index_file.exists() or not store_dir.is_dir():
+        print("⚠️ Index not found. Please Make Sure You have Index...")
+        return [RetrievalResult() for _ in questions]
+
+    cached = await search_executor.run(index_cache.get, str(index_file), str(store_dir))
+    query_vecs = await embedding_executor.run(embedding_service.embed_documents, questions)
+    results = await search_executor.run(search_index_batch, cached, query_vecs, top_k)
+    return [
+        RetrievalResult(
+            texts=[row["text"] for row in rows],
+            ids=[row["id"] for row in rows],
+            query_vector=query_vec,
+            index_version=cached.version,
+            sources=[row["source"] for row in rows],
+            vectors=vectors,
         )
-        return chunks
-    except Exception as e:
-        return f"Error loading index or chunks: {str(e)}"
+        for query_vec, (rows, vectors) in zip(query_vecs, results)
+    ]
+
+
+def search_index(cached, query_vec, top_k):
+    D, I = cached.index.search(query_vec, top_k)
+    # Only the returned rows are read from the memory-mapped chunk store
+    rows = cached.chunks.get(I[0][I[0] >= 0])
+    return rows, reconstruct_vectors(cached.index, [row["id"] for row in rows])
+
+
+def search_index_batch(cached, query_vecs, top_k):
+    """One matrix search for many queries; returns (rows, vectors) per query."""
+    D, I = cached.index.search(query_vecs, top_k)
+    results = []
+    for hits in I:
+        rows = cached.chunks.get(hits[hits >= 0])
+        results.append((rows, reconstruct_vectors(cached.index, [row["id"] for row in rows])))
+    return results
+
+
+def reconstruct_vectors(index, ids):
+    """Original vectors for `ids` in one call, or None where the index only keeps lossy PQ codes."""
+    if not ids or not has_exact_vectors(index):
+        return None
+    return index.reconstruct_batch(np.asarray(ids, dtype="int64"))
+
+
+async def migrate_legacy_index(user_id):
+    """Move a user's pickled chunk table to the chunk store on first use."""
+    index_file, store_dir, _ = index_paths(user_id)
+    if store_dir.exists() or not index_file.exists():
+        return
+    async with user_lock(user_id):
+        if not store_dir.exists():
+            user_index = await search_executor.run(UserIndex, user_id)
+            await search_executor.run(user_index.save)
+
+
 async def retrieve_chunks(
     query,
     origin="faiss_indecies",
     index_path="index.faiss",
-    chunks_path="chunk_lookup.pkl",
+    chunks_path="chunks",
     model="text-embedding-3-small",
     top_k=9
 ):
     
-    retrieved = []
     try:
         index_file = os.path.join(origin, index_path)
         chunks_file = os.path.join(origin, chunks_path)
         print(index_file, chunks_file)
 
-        # Load or create index and chunks
-        if os.path.exists(index_file) and os.path.exists(chunks_file):
-            print("✅ Loading FAISS index and chunks from disk...")
-            index = faiss.read_index(index_file)
-            with open(chunks_file, "rb") as f:
-                chunks_metadata = pickle.load(f)
-                chunks = [chunk.page_content for chunk in chunks_metadata]
+        timings = {}
+        # Load index and chunks, served from memory for recently used indexes
+        started = time.perf_counter()
+        if os.path.exists(index_file) and os.path.isdir(chunks_file):
+            cached = await search_executor.run(index_cache.get, index_file, chunks_file)
         else:
             print("⚠️ Index not found. Please Make Sure You have Index...")
-            return []
+            return RetrievalResult()
+        timings["index_load"] = time.perf_counter() - started
         # Embed the query
-        embeddings_model = HuggingFaceEmbeddings()
-        query_vec = embeddings_model.embed_documents([query])
-        query_vec = np.array([query_vec]).reshape(1, -1)
+        started = time.perf_counter()
+        query_vec = await embedding_service.embed_query(query)
+        query_vec = np.asarray(query_vec, dtype="float32").reshape(1, -1)
+        timings["embedding"] = time.perf_counter() - started
         # Search
-        D, I = index.search(query_vec, top_k)
-        retrieved = [chunks[i] for i in I[0] if i < len(chunks)]
-        return retrieved
+        started = time.perf_counter()
+        rows, vectors = await search_executor.run(search_index, cached, query_vec, top_k)
+        timings["search"] = time.perf_counter() - started
+        return RetrievalResult(
+            texts=[row["text"] for row in rows],
+            ids=[row["id"] for row in rows],
+            query_vector=query_vec[0],
+            index_version=cached.version,
+            sources=[row["source"] for row in rows],
+            vectors=vectors,
+            timings=timings,
+        )
 
+    except ExecutorSaturated:
+        raise
     except FileNotFoundError as fnf_err:
         print(f"❌ File error: {fnf_err}")
     except Exception as e:
         print(f"❌ Unexpected error: {e}")
 
-    return []  # Return empty list on failure
\ No newline at end of file
+    return RetrievalResult()  # Return an empty result on failure
\ No newline at end of file
@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import json
+import os
+import pickle
+from contextlib import asynccontextmanager
+from pathlib import Path
+import faiss
+import numpy as np
+from app.vectore_store.chunk_store import ChunkStore, append_chunks, compact, truncate_chunks
+from app.vectore_store.embedder import embedding_service
+from app.vectore_store.index_factory import (
+    build_index, has_exact_vectors, needs_rebuild, supports_remove,
+)
+
+INDEX_DIR = Path("faiss_indecies")
+
+# Compact the chunk store once more than this share of its rows are deleted
+COMPACT_DELETED_RATIO = 0.5
+# Pending chunk rows are written to the chunk store in batches of this size
+PENDING_FLUSH_ROWS = 4096
+
+# user id -> [lock, holders and waiters]
+_locks = {}
+
+
+@asynccontextmanager
+async def user_lock(user_id):
+    """One writer at a time per user index; the lock is dropped once nobody holds or waits on it."""
+    key = str(user_id)
+    entry = _locks.setdefault(key, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            del _locks[key]
+
+
+def file_sha256(file_path) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def index_paths(user_id):
+    return (
+        INDEX_DIR / f"{user_id}.faiss",
+        INDEX_DIR / f"{user_id}.chunks",
+        INDEX_DIR / f"{user_id}.json",
+    )
+
+
+def _atomic_write(path: Path, write):
+    tmp_path = path.with_name(path.name + ".tmp")
+    write(str(tmp_path))
+    os.replace(tmp_path, path)
+
+
+class UserIndex:
+    """
+    Append-mode FAISS index for one user.
+
+    Vectors are stored under stable, never reused IDs and their chunks in a
+    `ChunkStore` under the same IDs. The index type follows the corpus size
+    (see `index_factory`) and is rebuilt when the corpus outgrows it. A JSON manifest maps
+    each uploaded document (by filename) to its content hash and vector IDs,
+    so a document can be replaced or removed without rebuilding the rest of
+    the index.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.index_file, self.store_dir, self.manifest_file = index_paths(user_id)
+        self.legacy_chunks_file = INDEX_DIR / f"{user_id}.pkl"
+        self.index = None
+        self.manifest = {"next_id": 0, "documents": {}, "deleted_chunks": 0, "trained_on": 0}
+        # Rows added since the last save: (id, text, source, page)
+        self._pending = []
+        # Set when vectors were removed from the manifest but not from the index
+        self._stale = False
+        self._load()
+        # Chunk rows with IDs from here on were never covered by a saved index
+        self._saved_next_id = self.manifest["next_id"]
+        self._store_checked = False
+
+    def _load(self):
+        if not self.index_file.exists():
+            return
+        self.index = faiss.read_index(str(self.index_file))
+        if self.manifest_file.exists():
+            with open(self.manifest_file, "r", encoding="utf-8") as f:
+                self.manifest.update(json.load(f))
+        if self.legacy_chunks_file.exists() and not self.store_dir.exists():
+            self._load_legacy()
+
+    def _load_legacy(self):
+        """Convert a pickled chunk table (and a plain IndexFlatL2) to the current layout."""
+        with open(self.legacy_chunks_file, "rb") as f:
+            chunks = pickle.load(f)
+
+        if isinstance(chunks, list):
+            index = self.index
+            ids = np.arange(index.ntotal, dtype="int64")
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(index.d))
+            if index.ntotal:
+                self.index.add_with_ids(index.reconstruct_n(0, index.ntotal), ids)
+            chunks = dict(enumerate(chunks))
+            self.manifest["next_id"] = int(index.ntotal)
+            self.manifest["documents"] = {"legacy": {"sha256": None, "ids": ids.tolist()}}
+
+        for chunk_id, chunk in sorted(chunks.items()):
+            self._pending.append((
+                chunk_id,
+                chunk.page_content,
+                chunk.metadata.get("source", "legacy"),
+                chunk.metadata.get("page", -1),
+            ))
+
+    @property
+    def documents(self) -> dict:
+        return self.manifest["documents"]
+
+    def live_ids(self) -> list[int]:
+        return [chunk_id for document in self.documents.values() for chunk_id in document["ids"]]
+
+    def has_document(self, filename: str, sha256: str) -> bool:
+        document = self.documents.get(filename)
+        return document is not None and document["sha256"] == sha256
+
+    def add_chunks(self, filename: str, chunks: list, embeddings: np.ndarray):
+        """
+        Append one batch of a document's chunks. Large documents are added batch
+        by batch and then marked complete with `finish_document`.
+        """
+        document = self.documents.setdefault(filename, {"sha256": None, "ids": []})
+        start = self.manifest["next_id"]
+        ids = np.arange(start, start + len(chunks), dtype="int64")
+        if self.index is None:
+            self.index = build_index(embeddings, ids)
+            self.manifest["trained_on"] = len(ids)
+        else:
+            self.index.add_with_ids(np.ascontiguousarray(embeddings, dtype="float32"), ids)
+        for chunk_id, chunk in zip(ids.tolist(), chunks):
+            self._pending.append((chunk_id, chunk.page_content, filename, chunk.metadata.get("page", -1)))
+        self.manifest["next_id"] = start + len(chunks)
+        document["ids"].extend(ids.tolist())
+        if len(self._pending) >= PENDING_FLUSH_ROWS:
+            self._flush_pending()
+
+    def finish_document(self, filename: str, sha256: str):
+        self.documents[filename]["sha256"] = sha256
+
+    def remove_document(self, filename: str) -> bool:
+        document = self.documents.pop(filename, None)
+        if document is None:
+            return False
+        ids = np.asarray(document["ids"], dtype="int64")
+        if self.index is not None and len(ids):
+            if supports_remove(self.index):
+                self.index.remove_ids(ids)
+            else:
+                self._stale = True
+        self.manifest["deleted_chunks"] += len(ids)
+        return True
+
+    def vectors(self, ids) -> np.ndarray:
+        """Original vectors for `ids`, reconstructed from the index or the embedding cache."""
+        ids = [int(chunk_id) for chunk_id in ids]
+        if not ids:
+            return np.empty((0, self.index.d), dtype="float32")
+        if has_exact_vectors(self.index):
+            return self.index.reconstruct_batch(np.asarray(ids, dtype="int64"))
+        # PQ codes are lossy; re-embed from the chunk texts, normally cache hits
+        return embedding_service.embed_chunks(ChunkStore(self.store_dir).texts(ids))
+
+    def rebuild(self):
+        """Rebuild the index over the live vectors with the type that fits its size."""
+        store = ChunkStore(self.store_dir)
+        ids = [row["id"] for row in store.get(sorted(self.live_ids()))]
+        self.index = build_index(self.vectors(ids).reshape(len(ids), self.index.d), ids)
+        self.manifest["trained_on"] = len(ids)
+        self._stale = False
+
+    def _flush_pending(self):
+        if not self._store_checked:
+            # A writer that failed after flushing left rows whose IDs the manifest
+            # will hand out again; drop them before appending (callers hold user_lock)
+            dropped = truncate_chunks(self.store_dir, self._saved_next_id)
+            if dropped:
+                print(f"⚠️ Dropped {dropped} unsaved chunk rows of user {self.user_id}")
+            self._store_checked = True
+        live = set(self.live_ids())
+        pending = [row for row in self._pending if row[0] in live]
+        self.manifest["deleted_chunks"] -= len(self._pending) - len(pending)
+        if pending or not self.store_dir.exists():
+            append_chunks(self.store_dir, *(list(zip(*pending)) or [[], [], [], []]))
+        self._pending = []
+
+    def save(self):
+        INDEX_DIR.mkdir(exist_ok=True)
+        if self.index is None:
+            return
+
+        # Chunks first: the index must never reference IDs the store lacks
+        self._flush_pending()
+        live = set(self.live_ids())
+
+        def write_manifest(path):
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.manifest, f)
+
+        if self._stale or needs_rebuild(self.index, self.manifest["trained_on"]):
+            self.rebuild()
+        _atomic_write(self.index_file, lambda path: faiss.write_index(self.index, path))
+
+        store = ChunkStore(self.store_dir)
+        if self.manifest["deleted_chunks"] > store.rows * COMPACT_DELETED_RATIO:
+            compact(self.store_dir, live)
+            self.manifest["deleted_chunks"] = 0
+        _atomic_write(self.manifest_file, write_manifest)
+        self.legacy_chunks_file.unlink(missing_ok=True)
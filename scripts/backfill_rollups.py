@@ -0,0 +1,51 @@
+"""
+Rebuild the session and user/day rollups from the raw query logs.
+
+Run once after upgrading (rollups are only maintained for queries logged
+afterwards), or any time to repair them:
+
+    python -m scripts.backfill_rollups
+    python -m scripts.backfill_rollups --user-id 3
+"""
+import argparse
+import time
+from sqlalchemy.exc import DBAPIError
+from app.database.base import Base
+from app.database.session import SessionLocal, engine
+from app.models.user import User
+from app.models.rollup import SessionRollup, UserDailyRollup
+from app.utils.rollups import is_deadlock, rebuild_user_rollups
+
+DEADLOCK_ATTEMPTS = 3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=int, help="only rebuild this user's rollups")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine, tables=[SessionRollup.__table__, UserDailyRollup.__table__])
+    db = SessionLocal()
+    try:
+        user_ids = [args.user_id] if args.user_id else [user_id for (user_id,) in db.query(User.id).order_by(User.id)]
+        for user_id in user_ids:
+            for attempt in range(1, DEADLOCK_ATTEMPTS + 1):
+                try:
+                    # One transaction per user, so readers never see a half-built account
+                    logs = rebuild_user_rollups(db, user_id)
+                    db.commit()
+                    break
+                except DBAPIError as e:
+                    db.rollback()
+                    # The query log writer may be updating the same rows
+                    if not is_deadlock(e) or attempt == DEADLOCK_ATTEMPTS:
+                        raise
+                    print(f"⚠️ Deadlock rebuilding user {user_id}, retrying")
+                    time.sleep(attempt)
+            print(f"User {user_id}: {logs} queries rolled up")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
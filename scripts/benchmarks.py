@@ -0,0 +1,230 @@
+"""
+Offline micro-benchmarks for the upload and retrieval hot paths, on synthetic data.
+
+    python -m scripts.benchmarks                                   # all benchmarks, default sizes
+    python -m scripts.benchmarks --only search --sizes 1000 100000 1000000 --kinds flat ivf hnsw
+    python -m scripts.benchmarks --output bench/base.json
+    python -m scripts.benchmarks --baseline bench/base.json --threshold 0.25
+
+Embeddings come from a small hashing model by default, so nothing is downloaded;
+pass `--model` with a sentence-transformers name or local path to measure a real one.
+With `--baseline`, metrics that got worse by more than `--threshold` (relative)
+are listed and the exit status is 1.
+"""
+import argparse
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+import numpy as np
+from app.utils.file_analyzer import count_pages, load_and_split_pages
+from app.vectore_store.chunk_store import ChunkStore, append_chunks
+from app.vectore_store.embedder import EmbeddingService
+from app.vectore_store.index_factory import FLAT, IVF, HNSW, IVFPQ, build_index
+from scripts.index_recall import synthetic_vectors
+
+BENCHMARKS = ("chunking", "embedding", "index_build", "search", "chunk_store")
+VOCABULARY = [f"word{i}" for i in range(5000)]
+
+
+class HashingEmbeddings:
+    """Tiny deterministic bag-of-words model with the HuggingFaceEmbeddings interface."""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def embed_documents(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            for word in text.split():
+                vectors[row, zlib.crc32(word.encode()) % self.dim] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.maximum(norms, 1e-6)).tolist()
+
+
+def synthetic_text(n_words: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    words = []
+    for i in range(n_words):
+        words.append(rng.choice(VOCABULARY))
+        if i % 15 == 14:
+            words.append(".\n" if i % 150 == 149 else ".")
+    return " ".join(words)
+
+
+def latency(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {"p50_ms": samples[len(samples) // 2], "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))]}
+
+
+def bench_chunking(args, workdir: Path) -> dict:
+    path = workdir / "corpus.txt"
+    path.write_text(synthetic_text(args.chunking_words))
+    size = path.stat().st_size
+    started = time.perf_counter()
+    chunks = 0
+    for page in range(count_pages(str(path))):
+        page_chunks, _ = load_and_split_pages(str(path), page, page + 1)
+        chunks += len(page_chunks)
+    seconds = time.perf_counter() - started
+    return {"bytes": size, "chunks": chunks, "mb_per_s": size / seconds / 1e6, "chunks_per_s": chunks / seconds}
+
+
+def bench_embedding(args, model) -> dict:
+    service = EmbeddingService(args.model or "hashing")
+    service._model = model
+    texts = [synthetic_text(80, seed=i) for i in range(max(args.batch_sizes) * 2)]
+    service.embed_documents(texts[:8])  # warm up
+    results = {}
+    for batch_size in args.batch_sizes:
+        batches = max(1, len(texts) // batch_size)
+        started = time.perf_counter()
+        for b in range(batches):
+            service.embed_documents(texts[b * batch_size:(b + 1) * batch_size])
+        seconds = time.perf_counter() - started
+        results[f"batch_{batch_size}"] = {"texts_per_s": batches * batch_size / seconds}
+    return results
+
+
+def bench_index(args) -> tuple[dict, dict]:
+    """Build time and single-query search latency per index kind and corpus size."""
+    builds, searches = {}, {}
+    for size in args.sizes:
+        vectors = synthetic_vectors(size, args.dim)
+        ids = np.arange(size, dtype="int64")
+        queries = synthetic_vectors(args.queries, args.dim, seed=1)
+        for kind in args.kinds:
+            key = f"{kind}_{size}"
+            started = time.perf_counter()
+            index = build_index(vectors, ids, kind)
+            builds[key] = {"build_s": time.perf_counter() - started}
+            searches[key] = latency(
+                lambda: index.search(queries[random.randrange(len(queries))][None, :], args.k), args.queries
+            )
+            del index
+    return builds, searches
+
+
+def bench_chunk_store(args, workdir: Path) -> dict:
+    results = {}
+    for size in args.sizes:
+        store_dir = workdir / f"store_{size}"
+        texts = [synthetic_text(80, seed=i % 1000) for i in range(size)]
+        append_chunks(store_dir, list(range(size)), texts, ["corpus.txt"] * size, [0] * size)
+        opened = latency(lambda: ChunkStore(store_dir), 20)
+        store = ChunkStore(store_dir)
+        lookup = latency(lambda: store.get(random.sample(range(size), min(args.k, size))), args.queries)
+        results[f"rows_{size}"] = {"open_p50_ms": opened["p50_ms"], "lookup_p50_ms": lookup["p50_ms"]}
+        shutil.rmtree(store_dir)
+    return results
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def regressions(current: dict, baseline: dict, threshold: float, min_delta_ms: float = 0.0) -> list[str]:
+    """
+    Metrics worse than the baseline by more than `threshold`; *_per_s is
+    higher-is-better, *_ms / *_s lower. Latencies that moved by less than
+    `min_delta_ms` are treated as noise.
+    """
+    found = []
+    current, baseline = flatten(current), flatten(baseline)
+    for name, before in baseline.items():
+        after = current.get(name)
+        if after is None or not before:
+            continue
+        if name.endswith("_per_s"):
+            change = (before - after) / before
+        elif name.endswith(("_ms", "_s")):
+            if (after - before) * (1 if name.endswith("_ms") else 1000) < min_delta_ms:
+                continue
+            change = (after - before) / before
+        else:
+            continue
+        if change > threshold:
+            found.append(f"{name}: {before:.4g} -> {after:.4g} ({change:+.0%} worse)")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000, 100000],
+                        help="corpus sizes (vectors / chunk rows)")
+    parser.add_argument("--kinds", nargs="+", default=[FLAT, IVF, HNSW, IVFPQ], choices=[FLAT, IVF, HNSW, IVFPQ])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=9)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8, 32, 128, 512])
+    parser.add_argument("--chunking-words", type=int, default=500000)
+    parser.add_argument("--model", default=None, help="sentence-transformers model instead of the hashing model")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05, help="ignore latency changes smaller than this")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    if args.model:
+        from langchain.embeddings import HuggingFaceEmbeddings
+        model = HuggingFaceEmbeddings(model_name=args.model)
+    else:
+        model = HashingEmbeddings(args.dim)
+
+    workdir = Path(tempfile.mkdtemp(prefix="qa-rag-bench-"))
+    results = {}
+    try:
+        for name in args.only:
+            print(f"Running {name}...")
+            if name == "chunking":
+                results[name] = bench_chunking(args, workdir)
+            elif name == "embedding":
+                results[name] = bench_embedding(args, model)
+            elif name in ("index_build", "search"):
+                if name not in results:
+                    builds, searches = bench_index(args)
+                    for key, value in (("index_build", builds), ("search", searches)):
+                        if key in args.only:
+                            results[key] = value
+            elif name == "chunk_store":
+                results[name] = bench_chunk_store(args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for name, value in flatten(results).items():
+        print(f"{name:45} {value:12.4f}")
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())["results"]
+        found = regressions(results, baseline, args.threshold, args.min_delta_ms)
+        for line in found:
+            print(f"❌ {line}")
+        if found:
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
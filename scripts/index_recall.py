@@ -0,0 +1,66 @@
+"""
+Report recall@k and search latency of approximate index types against the exact flat index.
+
+    python -m scripts.index_recall --user-id 3
+    python -m scripts.index_recall --synthetic 200000 --dim 768 --kinds ivf hnsw ivfpq
+"""
+import argparse
+import json
+import numpy as np
+from app.vectore_store.index_factory import FLAT, IVF, HNSW, IVFPQ, build_index, measure_recall
+from app.vectore_store.user_index import UserIndex
+
+
+def synthetic_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    # Clustered data behaves more like real embeddings than uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, n // 1000), dim)).astype("float32")
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.3 * rng.normal(size=(n, dim)).astype("float32")
+    return vectors.astype("float32")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--user-id", help="measure a user's stored vectors")
+    source.add_argument("--synthetic", type=int, metavar="N", help="measure N synthetic vectors")
+    parser.add_argument("--dim", type=int, default=768, help="dimension of synthetic vectors")
+    parser.add_argument("--kinds", nargs="+", default=[IVF, HNSW, IVFPQ], choices=[FLAT, IVF, HNSW, IVFPQ])
+    parser.add_argument("--k", type=int, default=9)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = synthetic_vectors(args.synthetic, args.dim)
+        ids = np.arange(len(vectors), dtype="int64")
+    else:
+        user_index = UserIndex(args.user_id)
+        if user_index.index is None:
+            parser.error(f"user {args.user_id} has no index")
+        ids = np.asarray(sorted(user_index.live_ids()), dtype="int64")
+        vectors = user_index.vectors(ids)
+
+    # Queries are perturbed corpus vectors, so every query has true neighbours
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, len(vectors), args.queries)]
+    queries = queries + 0.05 * rng.normal(size=queries.shape).astype("float32")
+
+    results = []
+    for kind in args.kinds:
+        index = build_index(vectors, ids, kind=kind)
+        result = measure_recall(index, vectors, ids, queries, k=args.k)
+        result["vectors"] = len(vectors)
+        results.append(result)
+        print(
+            f"{kind:>6}: recall@{args.k}={result['recall']:.4f} "
+            f"search={result['search_ms']:.3f}ms exact={result['exact_search_ms']:.3f}ms"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
 from app.database.base import Base
 from app.database.session import engine
+from app.database.migrations import run_migrations
 from app.models.user import User
-from app.models.log import QueryLog
+from app.models.log import QueryLog, QueryStageTiming
+from app.models.job import IngestionJob
+from app.models.rollup import SessionRollup, UserDailyRollup
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
 
 if __name__ == "__main__":
     init_db()
@@ -0,0 +1,207 @@
+"""
+Drive a running app with concurrent virtual users and report latency percentiles.
+
+Each virtual user signs up (once), logs in, uploads a document and waits for its
+ingestion job, then streams `--asks` questions from /ask. Start the app against
+the mock LLM (scripts/mock_openai.py) to avoid spending real tokens:
+
+    python -m scripts.mock_openai --port 8001 &
+    AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8001 uvicorn app.main:app --port 8000 &
+    python -m scripts.load_test --base-url http://127.0.0.1:8000 --users 20 --asks 10
+
+Results (p50/p95/p99 per endpoint, time-to-first-token, throughput) are printed
+and written to `--output` as JSON, tagged with the current git commit.
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+import httpx
+
+QUESTIONS = [
+    "What is the main topic of the document?",
+    "Which steps are described for the setup?",
+    "What are the requirements mentioned?",
+    "Summarize the section about maintenance.",
+    "Who is responsible for the approval process?",
+]
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+
+def synthetic_document(user: int, paragraphs: int = 200) -> bytes:
+    lines = [
+        f"Section {i}. Setup step {i} requires approval from team {i % 7} "
+        f"and a maintenance window of {i % 5 + 1} hours for user {user}."
+        for i in range(paragraphs)
+    ]
+    return "\n\n".join(lines).encode("utf-8")
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def summarize(values: list[float], errors: int = 0) -> dict:
+    return {
+        "count": len(values),
+        "errors": errors,
+        "mean": sum(values) / len(values) if values else None,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+
+    def add(self, name: str, seconds: float):
+        self.samples.setdefault(name, []).append(seconds)
+
+    def error(self, name: str, detail: str):
+        self.errors[name] = self.errors.get(name, 0) + 1
+        print(f"❌ {name}: {detail}")
+
+
+async def timed(recorder: Recorder, name: str, request):
+    started = time.perf_counter()
+    try:
+        response = await request
+    except httpx.HTTPError as e:
+        recorder.error(name, repr(e))
+        return None
+    recorder.add(name, time.perf_counter() - started)
+    return response
+
+
+async def wait_for_job(client, headers, job_id, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = (await client.get(f"/upload_jobs/{job_id}", headers=headers)).json()
+        if job["status"] in TERMINAL_STATUSES:
+            return job
+        await asyncio.sleep(0.25)
+    return None
+
+
+async def ask(client, headers, question, recorder: Recorder):
+    started = time.perf_counter()
+    first_byte = None
+    try:
+        async with client.stream("POST", "/ask", headers=headers,
+                                 json={"question": question, "chat_history": []}) as response:
+            if response.status_code != 200:
+                recorder.error("ask", f"HTTP {response.status_code}")
+                return
+            async for piece in response.aiter_bytes():
+                if first_byte is None and piece:
+                    first_byte = time.perf_counter()
+    except httpx.HTTPError as e:
+        recorder.error("ask", repr(e))
+        return
+    recorder.add("ask", time.perf_counter() - started)
+    if first_byte is not None:
+        recorder.add("ttft", first_byte - started)
+
+
+async def virtual_user(client, user: int, args, recorder: Recorder):
+    email = f"{args.user_prefix}-{user}@example.com"
+    await client.post("/auth/signup", json={"email": email, "password": args.password})
+    response = await timed(recorder, "login", client.post(
+        "/auth/login", data={"username": email, "password": args.password}
+    ))
+    if response is None or response.status_code != 200:
+        recorder.error("login", f"HTTP {response.status_code if response is not None else '-'}")
+        return
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    if not args.skip_upload:
+        files = [("files", (f"loadtest-{user}.txt", synthetic_document(user), "text/plain"))]
+        started = time.perf_counter()
+        response = await timed(recorder, "upload", client.post("/upload_files", headers=headers, files=files))
+        if response is None or response.status_code != 202:
+            recorder.error("upload", f"HTTP {response.status_code if response is not None else '-'}")
+        else:
+            job = await wait_for_job(client, headers, response.json()["job_id"], args.job_timeout)
+            if job is None or job["status"] != "completed":
+                recorder.error("ingestion", job["status"] if job else "timed out")
+            else:
+                recorder.add("ingestion", time.perf_counter() - started)
+
+    for i in range(args.asks):
+        await ask(client, headers, QUESTIONS[(user + i) % len(QUESTIONS)], recorder)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.users * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.request_timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_user(client, user, args, recorder) for user in range(args.users)))
+        duration = time.perf_counter() - started
+
+    names = sorted(set(recorder.samples) | set(recorder.errors))
+    requests = sum(len(recorder.samples.get(name, [])) for name in ("login", "upload", "ask"))
+    return {
+        "started_at": datetime.utcnow().isoformat(),
+        "commit": git_commit(),
+        "config": vars(args),
+        "duration_seconds": duration,
+        "endpoints": {
+            name: summarize(recorder.samples.get(name, []), recorder.errors.get(name, 0)) for name in names
+        },
+        "throughput": {
+            "asks_per_second": len(recorder.samples.get("ask", [])) / duration,
+            "requests_per_second": requests / duration,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--asks", type=int, default=5, help="questions per user")
+    parser.add_argument("--user-prefix", default="loadtest")
+    parser.add_argument("--password", default="loadtest-password")
+    parser.add_argument("--skip-upload", action="store_true", help="ask against documents uploaded by an earlier run")
+    parser.add_argument("--job-timeout", type=float, default=300)
+    parser.add_argument("--request-timeout", type=float, default=120)
+    parser.add_argument("--output", default=None, help="result file (default load_results/load-<timestamp>.json)")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    for name, summary in result["endpoints"].items():
+        if summary["count"]:
+            print(
+                f"{name:10} n={summary['count']:5} errors={summary['errors']:4} "
+                f"p50={summary['p50'] * 1000:8.1f}ms p95={summary['p95'] * 1000:8.1f}ms p99={summary['p99'] * 1000:8.1f}ms"
+            )
+        else:
+            print(f"{name:10} n=    0 errors={summary['errors']:4}")
+    print(f"throughput: {result['throughput']['asks_per_second']:.2f} asks/s, "
+          f"{result['throughput']['requests_per_second']:.2f} requests/s")
+
+    output = Path(args.output or f"load_results/load-{datetime.utcnow():%Y%m%dT%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Local stand-in for the Azure OpenAI chat completions endpoint, for load tests without real tokens.
+
+    python -m scripts.mock_openai --port 8001 --tokens-per-second 50 --latency-ms 300 --error-rate 0.02
+
+Point the app at it with either
+    AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8001 AZURE_OPENAI_API_KEY=mock AZURE_OPENAI_API_VERSION=2024-02-01 AZURE_OPENAI_MODEL_NAME=mock
+or several deployments through the gateway:
+    LLM_DEPLOYMENTS='[{"endpoint": "http://127.0.0.1:8001", "api_key": "mock", "api_version": "2024-02-01", "model": "mock"}]'
+
+Non-streamed calls (the question rewrite) echo the last user message back, so
+rewrites leave the question unchanged. Streamed calls emit `--response-tokens`
+words at `--tokens-per-second` after `--latency-ms` (plus jitter). A share of
+calls fails with 429 (`--rate-limit-rate`, with Retry-After) or 500 (`--error-rate`).
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = ("the", "answer", "is", "based", "on", "the", "provided", "context", "and", "documents")
+
+app = FastAPI(title="Mock Azure OpenAI")
+config = argparse.Namespace(
+    tokens_per_second=50.0, latency_ms=300.0, jitter_ms=50.0, response_tokens=60,
+    error_rate=0.0, rate_limit_rate=0.0, retry_after=1.0,
+)
+counters = {"requests": 0, "streamed": 0, "errors": 0, "rate_limited": 0}
+
+
+def _error():
+    """An injected failure response, or None."""
+    roll = random.random()
+    if roll < config.rate_limit_rate:
+        counters["rate_limited"] += 1
+        return JSONResponse(
+            {"error": {"code": "429", "message": "Rate limit is exceeded (mock)."}},
+            status_code=429,
+            headers={"Retry-After": str(config.retry_after)},
+        )
+    if roll < config.rate_limit_rate + config.error_rate:
+        counters["errors"] += 1
+        return JSONResponse({"error": {"code": "500", "message": "Injected server error (mock)."}}, status_code=500)
+    return None
+
+
+async def _first_token_delay():
+    jitter = random.uniform(-config.jitter_ms, config.jitter_ms)
+    await asyncio.sleep(max(0.0, config.latency_ms + jitter) / 1000)
+
+
+def _chunk(completion_id, model, content=None, finish_reason=None):
+    delta = {"content": content} if content is not None else {}
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+@app.post("/openai/deployments/{deployment}/chat/completions")
+async def chat_completions(deployment: str, request: Request):
+    counters["requests"] += 1
+    body = await request.json()
+    failure = _error()
+    if failure is not None:
+        return failure
+
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    if not body.get("stream"):
+        await _first_token_delay()
+        content = next((m["content"] for m in reversed(body["messages"]) if m["role"] == "user"), "")
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": deployment,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    counters["streamed"] += 1
+
+    async def stream():
+        await _first_token_delay()
+        interval = 1 / config.tokens_per_second if config.tokens_per_second > 0 else 0
+        for i in range(config.response_tokens):
+            word = WORDS[i % len(WORDS)]
+            yield f"data: {json.dumps(_chunk(completion_id, deployment, word if i == 0 else ' ' + word))}\n\n"
+            await asyncio.sleep(interval)
+        yield f"data: {json.dumps(_chunk(completion_id, deployment, finish_reason='stop'))}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+async def stats():
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--tokens-per-second", type=float, default=config.tokens_per_second)
+    parser.add_argument("--latency-ms", type=float, default=config.latency_ms, help="time to first token")
+    parser.add_argument("--jitter-ms", type=float, default=config.jitter_ms)
+    parser.add_argument("--response-tokens", type=int, default=config.response_tokens)
+    parser.add_argument("--error-rate", type=float, default=config.error_rate, help="share of calls failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=config.rate_limit_rate, help="share of calls failing with 429")
+    parser.add_argument("--retry-after", type=float, default=config.retry_after)
+    args = parser.parse_args()
+    for name in vars(config):
+        setattr(config, name, getattr(args, name))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Compare PDF backends on real documents: pages/sec, single process and across the parse pool.
+
+    python -m scripts.parser_benchmark manuals/*.pdf
+    python -m scripts.parser_benchmark --backends pymupdf pypdf --workers 8 manual.pdf
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from app.config import settings
+from app.utils.file_analyzer import count_pages, load_and_split_pages
+from app.utils.pdf_backends import PDF_BACKENDS
+
+
+def benchmark(backend: str, paths: list[str], workers: int) -> dict:
+    ranges = []
+    for path in paths:
+        pages = count_pages(path, backend)
+        ranges.extend(
+            (path, start, min(start + settings.PARSE_PAGES_PER_TASK, pages), backend)
+            for start in range(0, pages, settings.PARSE_PAGES_PER_TASK)
+        )
+    total_pages = sum(end - start for _, start, end, _ in ranges)
+
+    started = time.perf_counter()
+    for page_range in ranges:
+        load_and_split_pages(*page_range)
+    serial = time.perf_counter() - started
+
+    with ProcessPoolExecutor(workers) as pool:
+        started = time.perf_counter()
+        list(pool.map(load_and_split_pages, *zip(*ranges)))
+        parallel = time.perf_counter() - started
+
+    return {
+        "pages": total_pages,
+        "serial_pages_per_second": total_pages / serial,
+        "parallel_pages_per_second": total_pages / parallel,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="PDF files to parse")
+    parser.add_argument("--backends", nargs="+", default=list(PDF_BACKENDS), choices=list(PDF_BACKENDS))
+    parser.add_argument("--workers", type=int, default=settings.PARSE_WORKERS or os.cpu_count())
+    args = parser.parse_args()
+
+    for backend in args.backends:
+        try:
+            result = benchmark(backend, args.paths, args.workers)
+        except ImportError as e:
+            print(f"{backend:>10}: not installed ({e})")
+            continue
+        print(
+            f"{backend:>10}: {result['pages']} pages, "
+            f"{result['serial_pages_per_second']:.1f} pages/s serial, "
+            f"{result['parallel_pages_per_second']:.1f} pages/s with {args.workers} workers"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+import pytest
+
+# Settings are read at import time: point the app at a throwaway SQLite database first
+_TMP_DIR = tempfile.mkdtemp(prefix="qa-rag-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_TMP_DIR}/test.db")
+os.environ.setdefault("EMBEDDING_CACHE_DIR", f"{_TMP_DIR}/embedding_cache")
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "test")
+os.environ.setdefault("AZURE_OPENAI_API_VERSION", "2024-02-01")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "http://localhost")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+@pytest.fixture
+def db_engine():
+    """The app's sync engine with every table created empty."""
+    from app.database.base import Base
+    from app.database.session import engine
+    import app.models.job, app.models.log, app.models.rollup, app.models.user  # noqa: F401
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
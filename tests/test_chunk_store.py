@@ -0,0 +1,57 @@
+import pytest
+from app.vectore_store.chunk_store import ChunkStore, append_chunks, compact, truncate_chunks
+
+
+def _append(directory, ids, source="a.pdf"):
+    append_chunks(directory, ids, [f"chunk {i} ü" for i in ids], [source] * len(ids), [i % 3 - 1 for i in ids])
+
+
+def test_append_and_lookup(tmp_path):
+    _append(tmp_path, [0, 1, 2])
+    _append(tmp_path, [5, 6], source="b.txt")
+    store = ChunkStore(tmp_path)
+    assert store.rows == 5
+    assert [row["id"] for row in store.get([6, 0, 3, 2])] == [6, 0, 2]
+    assert store.get([5])[0] == {"id": 5, "text": "chunk 5 ü", "source": "b.txt", "page": 1}
+    assert store.get([0])[0]["page"] is None
+
+
+@pytest.mark.parametrize("ids", [[2, 3], [4, 4], [5, 4]])
+def test_append_rejects_ids_that_do_not_increase(tmp_path, ids):
+    _append(tmp_path, [0, 1, 2])
+    with pytest.raises(ValueError):
+        _append(tmp_path, ids)
+    # The store is left as it was
+    assert list(ChunkStore(tmp_path).ids) == [0, 1, 2]
+
+
+def test_truncate_drops_rows_from_next_id_and_next_append_overwrites_them(tmp_path):
+    _append(tmp_path, [0, 1, 2, 3, 4])
+    assert truncate_chunks(tmp_path, 3) == 2
+    assert list(ChunkStore(tmp_path).ids) == [0, 1, 2]
+    assert truncate_chunks(tmp_path, 3) == 0
+
+    # IDs that were truncated away can be appended again
+    append_chunks(tmp_path, [3], ["replacement"], ["c.md"], [-1])
+    store = ChunkStore(tmp_path)
+    assert list(store.ids) == [0, 1, 2, 3]
+    assert store.texts([2, 3]) == ["chunk 2 ü", "replacement"]
+
+
+def test_truncate_without_a_store_is_a_no_op(tmp_path):
+    assert truncate_chunks(tmp_path / "missing", 0) == 0
+
+
+def test_compact_keeps_only_live_ids_in_order(tmp_path):
+    store_dir = tmp_path / "store"
+    _append(store_dir, [0, 1, 2, 3])
+    _append(store_dir, [7, 8], source="b.txt")
+    compact(store_dir, [8, 2, 0, 7, 2])
+    store = ChunkStore(store_dir)
+    assert list(store.ids) == [0, 2, 7, 8]
+    assert store.texts([0, 2, 7, 8]) == ["chunk 0 ü", "chunk 2 ü", "chunk 7 ü", "chunk 8 ü"]
+    assert [row["source"] for row in store.get([2, 8])] == ["a.pdf", "b.txt"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["store"]
+    # Appends continue after the largest live ID
+    _append(store_dir, [9])
+    assert list(ChunkStore(store_dir).ids) == [0, 2, 7, 8, 9]
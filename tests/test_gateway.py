@@ -0,0 +1,136 @@
+import asyncio
+import httpx
+import openai
+from app.agent.gateway import Deployment, LLMGateway
+
+
+def _connection_error():
+    return openai.APIConnectionError(request=httpx.Request("POST", "http://localhost/chat/completions"))
+
+
+def _chunk(content):
+    delta = type("Delta", (), {"content": content})()
+    choice = type("Choice", (), {"delta": delta})()
+    return type("Chunk", (), {"choices": [choice]})()
+
+
+def _message(content):
+    message = type("Message", (), {"content": content})()
+    choice = type("Choice", (), {"message": message})()
+    return type("Completion", (), {"choices": [choice]})()
+
+
+class FakeStream:
+    """A streamed completion that raises `error` before its first chunk, if given."""
+
+    def __init__(self, contents, error=None):
+        self.contents = contents
+        self.error = error
+        self.closed = False
+
+    async def _chunks(self):
+        if self.error is not None:
+            raise self.error
+        for content in self.contents:
+            yield _chunk(content)
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    """Stands in for AsyncAzureOpenAI: `create` answers with the next scripted reply."""
+
+    def __init__(self, replies, delay=0.0):
+        self.replies = list(replies)
+        self.delay = delay
+        self.calls = 0
+        self.cancelled = 0
+        self.chat = type("Chat", (), {"completions": self})()
+
+    async def create(self, **params):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+def _gateway(*clients, max_retries=3, hedge_delay_ms=750):
+    deployments = [Deployment(f"d{i}", client, "model") for i, client in enumerate(clients)]
+    return LLMGateway(deployments, max_concurrency=4, max_retries=max_retries, retry_base_seconds=0.001,
+                      retry_max_seconds=0.002, hedge_delay_ms=hedge_delay_ms)
+
+
+MESSAGES = [{"role": "user", "content": "question"}]
+
+
+def test_stream_retries_until_first_token_then_succeeds():
+    failing = [FakeStream([], error=_connection_error()) for _ in range(2)]
+    good = FakeStream(["Hello", " world"])
+    client = FakeClient(failing + [good])
+    gateway = _gateway(client)
+
+    async def run():
+        return [delta async for delta in gateway.stream_chat(MESSAGES)]
+
+    assert asyncio.run(run()) == ["Hello", " world"]
+    assert client.calls == 3
+    assert gateway.counters["retries"] == 2
+    assert gateway.counters["failures"] == 0
+    # Every opened stream is released, the failed ones before their retry
+    assert all(stream.closed for stream in failing + [good])
+
+
+def test_stream_gives_up_after_max_retries():
+    streams = [FakeStream([], error=_connection_error()) for _ in range(2)]
+    gateway = _gateway(FakeClient(streams), max_retries=1)
+
+    async def run():
+        return [delta async for delta in gateway.stream_chat(MESSAGES)]
+
+    try:
+        asyncio.run(run())
+        assert False, "expected APIConnectionError"
+    except openai.APIConnectionError:
+        pass
+    assert gateway.counters["failures"] == 1
+    assert all(stream.closed for stream in streams)
+
+
+def test_hedge_returns_the_faster_deployment_and_cancels_the_other():
+    slow = FakeClient([_message("slow")], delay=1.0)
+    fast = FakeClient([_message("fast")])
+    gateway = _gateway(slow, fast, hedge_delay_ms=20)
+    # Make the slow deployment the one the primary request goes to
+    gateway.deployments[1].weight = 1e-12
+
+    async def run():
+        answer = await gateway.complete(MESSAGES, hedge=True)
+        # Let the cancellation reach the losing request; asyncio.run would cancel it anyway on exit
+        await asyncio.sleep(0)
+        return answer, slow.cancelled
+
+    assert asyncio.run(run()) == ("fast", 1)
+    assert slow.calls == 1 and fast.calls == 1
+    assert gateway.counters["hedged"] == 1
+    assert gateway.counters["hedge_wins"] == 1
+
+
+def test_no_hedge_when_primary_answers_within_the_delay():
+    primary = FakeClient([_message("quick")])
+    other = FakeClient([_message("unused")])
+    gateway = _gateway(primary, other, hedge_delay_ms=500)
+    gateway.deployments[1].weight = 1e-12
+
+    assert asyncio.run(gateway.complete(MESSAGES, hedge=True)) == "quick"
+    assert other.calls == 0
+    assert gateway.counters["hedged"] == 0
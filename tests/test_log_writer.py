@@ -0,0 +1,92 @@
+import asyncio
+from datetime import datetime
+import pytest
+from sqlalchemy.exc import IntegrityError, InternalError
+from app.database.session import SessionLocal
+from app.models.log import QueryLog, QueryStageTiming, UserSession
+from app.models.rollup import SessionRollup
+from app.models.user import User
+from app.utils import log_writer
+from app.utils.log_writer import QueryLogWriter
+
+
+class MySQLError(Exception):
+    """Stand-in for a mysql-connector error carrying its server error number."""
+
+    def __init__(self, errno, msg):
+        super().__init__(msg)
+        self.errno = errno
+
+
+@pytest.fixture
+def session_id(db_engine):
+    db = SessionLocal()
+    db.add(User(id=1, email="a@example.com", hashed_password="x"))
+    db.add(UserSession(id=1, user_id=1, started_at=datetime.utcnow()))
+    db.commit()
+    db.close()
+    return 1
+
+
+def make_log(session_id):
+    return QueryLog(
+        user_id=1, session_id=session_id, question="q", response="r", response_time=0.5,
+        timestamp=datetime.utcnow(), stage_timings=[QueryStageTiming(stage="total", seconds=0.5)],
+    )
+
+
+def write(logs):
+    writer = QueryLogWriter(max_queue=100, batch_size=len(logs), flush_interval_ms=50)
+
+    async def run():
+        await writer.start()
+        for log in logs:
+            await writer.submit(log)
+        await writer.stop()
+
+    asyncio.run(run())
+    return writer
+
+
+def stored(session_id):
+    db = SessionLocal()
+    try:
+        rows = db.query(QueryLog).filter(QueryLog.session_id == session_id).count()
+        rollup = db.query(SessionRollup).filter(SessionRollup.session_id == session_id).first()
+        return rows, rollup.query_count if rollup else 0
+    finally:
+        db.close()
+
+
+def test_deadlocks_are_retried(session_id, monkeypatch):
+    real_update = log_writer.update_rollups
+    calls = []
+
+    def deadlock_three_times(db, logs):
+        calls.append(len(logs))
+        if len(calls) <= 3:
+            raise InternalError("SELECT ... FOR UPDATE", {}, MySQLError(1213, "Deadlock found when trying to get lock"))
+        real_update(db, logs)
+
+    monkeypatch.setattr(log_writer, "update_rollups", deadlock_three_times)
+    writer = write([make_log(session_id) for _ in range(3)])
+
+    # Batch, batch retry, then each row (the first row once more after its own deadlock)
+    assert calls == [3, 3, 1, 1, 1, 1]
+    assert stored(session_id) == (3, 3)
+    assert writer.counters["failed"] == 0
+
+
+def test_bad_row_does_not_drop_its_batch(session_id, monkeypatch):
+    real_update = log_writer.update_rollups
+
+    def reject_missing_session(db, logs):
+        if any(log.session_id == 999 for log in logs):
+            raise IntegrityError("INSERT INTO query_logs", {}, Exception("FOREIGN KEY constraint failed"))
+        real_update(db, logs)
+
+    monkeypatch.setattr(log_writer, "update_rollups", reject_missing_session)
+    writer = write([make_log(session_id), make_log(999), make_log(session_id)])
+
+    assert stored(session_id) == (2, 2)
+    assert writer.counters["failed"] == 1
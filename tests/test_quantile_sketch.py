@@ -0,0 +1,59 @@
+import math
+import random
+import pytest
+from app.utils.quantile_sketch import QuantileSketch
+
+
+def nearest_rank(values, q):
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(q * len(ordered))) - 1]
+
+
+def sketch_of(values, accuracy=0.02):
+    sketch = QuantileSketch(accuracy)
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+@pytest.mark.parametrize("q", [0.0, 0.25, 0.5, 0.9, 0.95, 0.99, 1.0])
+def test_quantiles_within_relative_accuracy(q):
+    rng = random.Random(q)
+    values = [rng.lognormvariate(-1, 1.2) for _ in range(5000)]
+    exact = nearest_rank(values, q)
+    assert sketch_of(values).quantile(q) == pytest.approx(exact, rel=0.02)
+
+
+def test_small_counts_use_nearest_rank():
+    sketch = sketch_of([0.1, 0.2, 0.3])
+    assert sketch.quantile(0.5) == pytest.approx(0.2, rel=0.02)
+    assert sketch.quantile(0.95) == pytest.approx(0.3, rel=0.02)
+    assert sketch.quantile(0.99) == pytest.approx(0.3, rel=0.02)
+
+
+def test_merge_matches_single_sketch():
+    rng = random.Random(1)
+    values = [rng.uniform(0.001, 30) for _ in range(3000)] + [0.0] * 10
+    parts = [values[i::3] for i in range(3)]
+    merged = QuantileSketch()
+    for part in parts:
+        merged.merge(sketch_of(part))
+
+    whole = sketch_of(values)
+    assert merged.count == whole.count == len(values)
+    for q in (0.0, 0.5, 0.95, 0.99):
+        assert merged.quantile(q) == whole.quantile(q)
+
+
+def test_json_round_trip_and_empty_sketch():
+    sketch = sketch_of([0.0, 0.5, 1.5, 1.5])
+    restored = QuantileSketch.from_json(sketch.to_json())
+    assert restored.count == 4
+    assert restored.quantile(0.5) == sketch.quantile(0.5)
+    assert QuantileSketch().quantile(0.5) is None
+    assert QuantileSketch.from_json("").count == 0
+
+
+def test_merge_rejects_different_accuracy():
+    with pytest.raises(ValueError):
+        QuantileSketch(0.02).merge(QuantileSketch(0.01))
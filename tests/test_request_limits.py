@@ -0,0 +1,53 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app.utils.request_limits import BodySizeLimitMiddleware
+
+
+def _client(max_bytes=100):
+    app = FastAPI()
+    received = []
+
+    @app.post("/upload_files")
+    async def upload(request: Request):
+        body = await request.body()
+        received.append(len(body))
+        return {"size": len(body)}
+
+    @app.post("/other")
+    async def other(request: Request):
+        return {"size": len(await request.body())}
+
+    app.add_middleware(BodySizeLimitMiddleware, max_bytes=max_bytes, paths=("/upload_files",))
+    return TestClient(app), received
+
+
+def test_body_within_limit_passes():
+    client, received = _client()
+    response = client.post("/upload_files", content=b"x" * 100)
+    assert response.status_code == 200
+    assert received == [100]
+
+
+def test_content_length_over_limit_is_refused_before_the_route():
+    client, received = _client()
+    response = client.post("/upload_files", content=b"x" * 101)
+    assert response.status_code == 413
+    assert received == []
+
+
+def test_streamed_body_without_content_length_is_cut_off():
+    client, received = _client()
+
+    def chunks():
+        for _ in range(5):
+            yield b"x" * 40
+
+    response = client.post("/upload_files", content=chunks())
+    assert response.status_code == 413
+    assert received == []
+
+
+def test_other_paths_are_not_limited():
+    client, _ = _client()
+    response = client.post("/other", content=b"x" * 1000)
+    assert response.status_code == 200
@@ -0,0 +1,32 @@
+import base64
+import json
+from datetime import datetime
+import pytest
+from fastapi import HTTPException
+from app.routes.sessions import decode_cursor, encode_cursor
+
+
+def raw_cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+def test_round_trip():
+    started = datetime(2026, 1, 2, 3, 4, 5, 678901)
+    assert decode_cursor(encode_cursor(started, 42), datetime, int) == [started, 42]
+    assert decode_cursor(encode_cursor(7, 42), int, int) == [7, 42]
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    raw_cursor({"key": 1}),
+    raw_cursor([1]),
+    raw_cursor([1, 2, 3]),
+    raw_cursor(["2026-01-02T03:04:05", "x"]),
+    raw_cursor([None, 2]),
+    raw_cursor(["yesterday", 2]),
+])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, datetime, int)
+    assert error.value.status_code == 400